@@ -1,18 +1,26 @@
 import streamlit as st
 import numpy as np
-import pandas as pd  # <--- Added for the Results Table
 import time
-import matplotlib
-matplotlib.use('Agg')  # Prevents threading errors in Streamlit
-import matplotlib.pyplot as plt
+import copy
+import os
+import uuid
+
+# pandas, matplotlib, plotly and scikit-learn are imported on first use (tables,
+# figures, the forest engine), so a fresh session starts on NumPy alone.
 
 # --- 1. ROBUST IMPORT SYSTEM ---
 try:
-    from modules.physics import SoleSimulation
+    from modules.physics import SoleSimulation, GROOVE_TYPES, GAIT_TYPES
     from modules.visualization import (
-        plot_static_heatmap, plot_dynamic_heatmap, plot_live_chart, create_3d_topology
+        plot_static_heatmap, plot_dynamic_heatmap, plot_live_chart, create_3d_topology, figure_to_png,
+        pressure_to_rgb, LivePeakChart, create_pareto_plot, plot_wear_map
     )
-    from modules.ai_optimizer import run_inverse_design
+    from modules.ai_optimizer import run_inverse_design, run_direct_design, get_surrogate_store
+    from modules.wear import forecast_wear, WEAR_THROUGH_MM
+    from modules.dynamics import run_stance
+    from modules import profiling
+    from modules.jobs import JobManager
+    from modules.sweep import MATERIALS, PARETO_OBJECTIVES, design_metrics, random_geometries, run_design_sweep
 except ImportError as e:
     st.error(f"⚠️ SYSTEM BOOT FAILURE: Missing Modules.\n\nError Details: {e}")
     st.stop()
@@ -65,6 +73,159 @@ st.markdown("""
 if 'page' not in st.session_state: st.session_state.page = 'landing'
 def go_to_dashboard(): st.session_state.page = 'dashboard'
 
+# --- 3. CACHED ENGINES & RESULTS ---
+# Shared across sessions; oldest entries are evicted past max_entries or after the TTL.
+SOLVE_CACHE_SIZE = 256
+FIGURE_CACHE_SIZE = 64
+CACHE_TTL_S = 3600
+
+def cached(name, fn, *args):
+    # Cached bodies count "cache.<name>.miss"; a call that didn't add one was a hit
+    profiler = profiling.current()
+    misses = profiler.counters.get(f"cache.{name}.miss", 0) if profiler is not None else 0
+    with profiling.span(f"app.{name}"):
+        result = fn(*args)
+    if profiler is not None and profiler.counters.get(f"cache.{name}.miss", 0) == misses:
+        profiling.count(f"cache.{name}.hit")
+    return result
+
+@st.cache_resource(max_entries=8)
+def load_engine(gait):
+    # Grid, foot shape and contact ordering per gait. Treated as read-only.
+    sim = SoleSimulation()
+    sim.update_gait(gait)
+    return sim
+
+def design_engine(gait, heel, fore, arch, modulus, groove, wear_factor):
+    # Session-local copy for stateful runs (walk wear, AI module)
+    sim = copy.deepcopy(load_engine(gait))
+    sim.update_design(heel, fore, arch, modulus, groove, wear_factor)
+    return sim
+
+@st.cache_data(max_entries=SOLVE_CACHE_SIZE, ttl=CACHE_TTL_S, show_spinner=False)
+def solve_design(gait, heel, fore, arch, modulus, groove, weight):
+    profiling.count("cache.solve_design.miss")
+    res = load_engine(gait).solve_static_batch(heel, fore, arch, modulus, weight, groove, return_maps=True)
+    return res["pressure_maps"][0], float(res["peak_pressure"][0]), bool(res["converged"][0])
+
+@st.cache_data(max_entries=8, ttl=CACHE_TTL_S, show_spinner=False)
+def sweep_designs(gait, weight, n_geometries, seed):
+    profiling.count("cache.sweep_designs.miss")
+    return run_design_sweep(load_engine(gait), weight, random_geometries(n_geometries, seed))
+
+@st.cache_data(max_entries=SOLVE_CACHE_SIZE, ttl=CACHE_TTL_S, show_spinner=False)
+def forecast_life(gait, heel, fore, arch, modulus, groove, weight, wear_factor, max_km=2000):
+    profiling.count("cache.forecast_life.miss")
+    sim = design_engine(gait, heel, fore, arch, modulus, groove, wear_factor)
+    return forecast_wear(sim, weight, max_km=max_km, checkpoint_km=25)["wear_through_km"] or max_km
+
+@st.cache_data(max_entries=FIGURE_CACHE_SIZE, ttl=CACHE_TTL_S, show_spinner=False)
+def render_static_heatmap(gait, heel, fore, arch, modulus, groove, weight):
+    profiling.count("cache.render_static_heatmap.miss")
+    pressure, peak, _ = solve_design(gait, heel, fore, arch, modulus, groove, weight)
+    return figure_to_png(plot_static_heatmap(pressure, peak))
+
+@st.cache_data(max_entries=FIGURE_CACHE_SIZE, ttl=CACHE_TTL_S, show_spinner=False)
+def render_topology(gait, heel, fore, arch, modulus, groove, weight):
+    profiling.count("cache.render_topology.miss")
+    pressure, _, _ = solve_design(gait, heel, fore, arch, modulus, groove, weight)
+    return create_3d_topology(pressure)
+
+# --- BACKGROUND JOBS ---
+@st.cache_resource
+def job_manager():
+    # One pool for the whole server; identical runs from different sessions share a job
+    return JobManager()
+
+def simulate_walk(sim, weight, n_phases, model, progress_callback=None):
+    sim.wear_map[:] = 0
+    phases = np.linspace(0, 1, n_phases)
+    if model == "Surrogate":
+        # Whole cycle in one pass, reusing the static solution
+        frames, peaks, loads = sim.solve_walk_cycle(weight, phases)
+    else:
+        # Time-domain stance; peaks include the heel-strike transient between frames
+        frames, peaks, loads = run_stance(sim, weight, n_phases, progress_callback=progress_callback)
+        sim.wear_map += frames.sum(axis=0) * sim.current_wear_factor
+    heat_scale = float(np.max(sim.static_pressure(weight))) * 1.5
+    return {"phases": phases, "frames": frames, "peaks": peaks, "loads": loads, "wear_map": sim.wear_map,
+            "heat_scale": heat_scale, "chart_limit": max(heat_scale, float(np.max(peaks)) + 1)}
+
+def optimize_design(sim, weight, target, direct, budget, progress_callback=None):
+    if direct:
+        return run_direct_design(sim, weight, target, budget=budget, progress_callback=progress_callback)
+    # Threads, not processes: a fresh worker process would re-run this script as its __main__
+    best, score = run_inverse_design(sim, weight, target, n_samples=budget, n_workers=os.cpu_count(),
+                                     backend="thread", progress_callback=progress_callback)
+    return best, score, None
+
+def session_id():
+    return st.session_state.setdefault("session_id", uuid.uuid4().hex)
+
+def session_job(slot):
+    return job_manager().get(st.session_state.setdefault("jobs", {}).get(slot))
+
+def submit_job(slot, key, fn, *args):
+    # The slot's previous job is released, so an abandoned run does not hold a worker
+    previous = session_job(slot)
+    job = job_manager().submit(key, fn, *args, subscriber=session_id(), label=slot)
+    if previous is not None and previous is not job:
+        job_manager().release(previous, session_id())
+    st.session_state.jobs[slot] = job.id
+
+@st.fragment(run_every=0.5)
+def job_status(slot, text):
+    # Polls the job without blocking the page; a full rerun picks up the result
+    job = session_job(slot)
+    if job is None or not job.active:
+        st.rerun()
+    st.progress(job.progress, text=f"{text} [{job.status.upper()} {job.elapsed:.1f}s]")
+    if st.button("✖ CANCEL", key=f"cancel_{slot}"):
+        if job_manager().cancel(job, session_id()):
+            st.session_state.jobs.pop(slot, None)
+            st.rerun()
+        st.toast("Cancel requested; still running for another session, so its result will show here.")
+
+PLAYBACK_TICK_S = 0.05  # fastest walk playback refresh
+
+def walk_frame_index(view, n_frames, frame_delay):
+    # Playback follows the wall clock but never outpaces the refresh tick, so short
+    # delays (and 0) play one frame per tick; a refresh slower than the delay skips
+    # ahead, yet always shows at least the next frame
+    due = int((time.perf_counter() - view["start"]) / max(frame_delay, PLAYBACK_TICK_S))
+    return min(max(due, view["shown"] + 1), n_frames - 1)
+
+def draw_walk_frame(result, i, render_mode):
+    view = st.session_state.walk_view
+    phases, frames, peaks = result["phases"], result["frames"], result["peaks"]
+    if render_mode == "Fast (RGB)":
+        # Map straight to RGB buffers; the chart only draws the segments added since the last refresh
+        if view["chart"] is None:
+            view["chart"], view["charted"] = LivePeakChart(result["chart_limit"]), -1
+        for j in range(view["charted"] + 1, i + 1):
+            view["chart"].add_point(phases[j] * 100, peaks[j])
+        view["charted"] = max(view["charted"], i)
+        heat_rgb = pressure_to_rgb(frames[i], result["heat_scale"])
+        with profiling.span("streamlit.frame"):
+            st.image(heat_rgb, width="stretch")
+            st.image(view["chart"].canvas, width="stretch")
+    else:
+        heat_png = figure_to_png(plot_dynamic_heatmap(frames[i], result["heat_scale"]))
+        line_png = figure_to_png(plot_live_chart(peaks[:i + 1], phases[i], result["chart_limit"]))
+        with profiling.span("streamlit.frame"):
+            st.image(heat_png, width="stretch")
+            st.image(line_png, width="stretch")
+
+def walk_playback(render_mode, frame_delay):
+    result = session_job("walk").result
+    n = len(result["phases"])
+    i = walk_frame_index(st.session_state.walk_view, n, frame_delay)
+    draw_walk_frame(result, i, render_mode)
+    st.session_state.walk_view["shown"] = i
+    st.progress((i + 1) / n)
+    if i == n - 1:
+        st.rerun()
+
 # --- LANDING PAGE ---
 def show_landing_page():
     st.markdown("<br>", unsafe_allow_html=True)
@@ -88,14 +249,6 @@ def show_landing_page():
 
 # --- DASHBOARD ---
 def show_dashboard():
-    MATERIALS = {
-        "EVA Foam (Budget)":   {"mod": 25, "rho": 0.25, "wear": 0.020, "cost": 0.40},
-        "PU Foam (Standard)":  {"mod": 55, "rho": 0.45, "wear": 0.010, "cost": 0.90},
-        "Rubber (Heavy Duty)": {"mod": 90, "rho": 1.10, "wear": 0.005, "cost": 0.70},
-        "TPU (Premium)":       {"mod": 70, "rho": 1.20, "wear": 0.008, "cost": 2.10},
-        "Custom / AI Mode":    {"mod": 30, "rho": 0.30, "wear": 0.015, "cost": 0.50} 
-    }
-
     with st.sidebar:
         st.markdown("### ⚙️ CONTROLS")
         st.info("System Parameters")
@@ -112,28 +265,30 @@ def show_dashboard():
         p_heel = st.slider("Heel Stack (mm)", 5, 50, 25)
         p_fore = st.slider("Forefoot Stack (mm)", 5, 50, 15)
         p_arch = st.slider("Arch Factor", 0.5, 5.0, 1.5)
-        p_groove = st.selectbox("Tread Pattern", ["None", "Horizontal Sipes", "Grid Pattern", "Honeycomb"])
+        p_groove = st.selectbox("Tread Pattern", GROOVE_TYPES)
         
         st.divider()
-        p_gait = st.selectbox("Gait Profile", ["Neutral", "Overpronator (Flat Foot)", "Supinator (High Arch)"])
+        p_gait = st.selectbox("Gait Profile", GAIT_TYPES)
         p_weight = st.slider("Weight (kg)", 40, 120, 75)
         
         st.divider()
+        walk_phases = st.slider("Walk Phases", 20, 500, 20, step=10)
+        walk_model = st.radio("Walk Model", ["Surrogate", "Transient (Spring-Damper)"], horizontal=True)
+        render_mode = st.radio("Render Mode", ["Fast (RGB)", "Matplotlib"], horizontal=True)
+        frame_delay = st.slider("Frame Delay (s)", 0.0, 0.5, 0.1, step=0.01)
         run_walk = st.button("▶ EXECUTE_WALK_CYCLE", type="primary")
 
+        st.divider()
+        st.checkbox("Diagnostics", key="diagnostics", help="Time solve/render/train stages for this session")
+
     # --- DYNAMIC CALCULATION ENGINE (METRICS) ---
-    avg_thickness_mm = (p_heel + p_fore) / 2
-    est_volume_cm3 = (avg_thickness_mm / 10) * 250 
-    
-    # 2. Mass & Cost Calculation
-    est_mass_g = est_volume_cm3 * p_density
-    est_cost_inr = est_mass_g * mat_props.get("cost", 0.5) * 1.5 
+    metrics = design_metrics(p_heel, p_fore, p_density, mat_props.get("cost", 0.5))
+    est_mass_g, est_cost_inr = metrics["mass_g"], metrics["cost_inr"]
+    est_carbon_kg = metrics["carbon_kg"]
     
-    # 3. Life Expectancy
-    est_life_km = 500 * (0.01 / p_wear_factor)
-    
-    # 4. Carbon Footprint 
-    est_carbon_kg = (est_mass_g * 0.02) / 1000
+    # 3. Life Expectancy (Archard wear forecast until the first cell wears through)
+    est_life_km = cached("forecast_life", forecast_life, p_gait, p_heel, p_fore, p_arch, p_modulus, p_groove,
+                         p_weight, p_wear_factor)
 
     # --- MAIN DISPLAY ---
     st.markdown('<div class="hacker-title" style="font-size: 2.5rem;">SOLESIM // DASHBOARD</div>', unsafe_allow_html=True)
@@ -149,13 +304,12 @@ def show_dashboard():
     
     col1, col2 = st.columns([1, 1])
     
+    design_key = (p_gait, p_heel, p_fore, p_arch, p_modulus, p_groove, p_weight)
     # Initialize Physics Engine
     try:
-        sim = SoleSimulation()
-        sim.update_gait(p_gait)
-        sim.update_design(p_heel, p_fore, p_arch, p_modulus, p_groove, p_wear_factor)
-        pressure = sim.solve_static(p_weight)
-        peak_p = np.max(pressure)
+        pressure, peak_p, converged = cached("solve_design", solve_design, *design_key)
+        if not converged:
+            st.warning("⚠️ SOLVER DID NOT CONVERGE: Load exceeds sole capacity, showing max compression state.")
     except Exception as e:
         st.error(f"PHYSICS ENGINE FAILURE: {e}")
         st.stop()
@@ -165,93 +319,147 @@ def show_dashboard():
         if peak_p > 250:
              st.warning("⚠️ WARNING: CRITICAL PRESSURE. Material Yield Limit Reached.")
         
-        fig_static = plot_static_heatmap(pressure, peak_p)
-        st.pyplot(fig_static)
+        static_png = cached("render_static_heatmap", render_static_heatmap, *design_key)
+        with profiling.span("streamlit.static_views"):
+            st.image(static_png, width="stretch")
         st.metric("COMFORT INDEX", f"{max(100 - (peak_p * 2.5), 0):.0f}/100")
-        st.markdown("### 3D TOPOLOGY")
-        st.plotly_chart(create_3d_topology(pressure), use_container_width=True)
+        # Plotly is only loaded once someone asks for the 3D view
+        if st.toggle("3D TOPOLOGY"):
+            fig_3d = cached("render_topology", render_topology, *design_key)
+            with profiling.span("streamlit.static_views"):
+                st.plotly_chart(fig_3d, use_container_width=True)
 
     with col2:
         st.subheader("2. DYNAMIC GAIT SURROGATE")
         st.markdown("""<div style="background:#000; border:1px solid #333; padding:10px; border-radius:5px; text-align:center;"><span style="color:#00FFFF; font-family:monospace;">LIVE SENSOR DATA FEED</span></div>""", unsafe_allow_html=True)
         
-        chart_spot = st.empty()
-        graph_spot = st.empty()
-        
         if run_walk:
-            try:
-                sim.wear_map[:] = 0
-                peak_hist = []
-                log_data = [] # <--- Data Logger List
-                
-                steps_count = 20
-                phases = np.linspace(0, 1, steps_count)
-                bar = st.progress(0)
-                
-                for i, phase in enumerate(phases):
-                    w_p, load = sim.solve_walking_step(p_weight, phase)
-                    peak_hist.append(np.max(w_p))
-                    
-                    # LOGGING DATA
-                    log_data.append({
-                        "Phase (%)": int(phase * 100),
-                        "Peak Pressure (kPa)": round(np.max(w_p), 2),
-                        "Applied Load (N)": round(load, 2)
-                    })
-                    
-                    # 1. Generate Figures
-                    fig_heat = plot_dynamic_heatmap(w_p, peak_p*1.5)
-                    fig_line = plot_live_chart(peak_hist, phase, max(peak_p*1.5, max(peak_hist) + 1))
-                    
-                    # 2. Update Placeholders
-                    chart_spot.pyplot(fig_heat)
-                    graph_spot.pyplot(fig_line)
-                    
-                    # 3. Explicit Memory Cleanup
-                    plt.close(fig_heat)
-                    plt.close(fig_line)
-                    
-                    # 4. Slower Sleep
-                    bar.progress((i+1)/steps_count)
-                    time.sleep(0.1) 
-                
-                bar.empty()
+            sim = design_engine(p_gait, p_heel, p_fore, p_arch, p_modulus, p_groove, p_wear_factor)
+            submit_job("walk", ("walk",) + design_key + (p_wear_factor, walk_phases, walk_model),
+                       simulate_walk, sim, p_weight, walk_phases, walk_model)
+            st.session_state.walk_view = None
+
+        walk_job = session_job("walk")
+        if walk_job is not None and walk_job.active:
+            job_status("walk", "SIMULATING GAIT CYCLE")
+        elif walk_job is not None and walk_job.status == "failed":
+            st.error(f"SIMULATION ABORTED: {walk_job.error}")
+        elif walk_job is not None and walk_job.status == "done":
+            result = walk_job.result
+            view = st.session_state.get("walk_view")
+            if view is None or view["job"] != walk_job.id:
+                view = st.session_state.walk_view = {"job": walk_job.id, "start": time.perf_counter(),
+                                                     "chart": None, "charted": -1, "shown": -1}
+            n = len(result["phases"])
+            if walk_frame_index(view, n, frame_delay) < n - 1:
+                # Frames advance in a fragment on a timer, so the rest of the page stays live
+                st.fragment(walk_playback, run_every=max(frame_delay, PLAYBACK_TICK_S))(render_mode, frame_delay)
+            else:
+                draw_walk_frame(result, n - 1, render_mode)
                 st.success("SEQUENCE COMPLETE")
                 
                 # --- NEW RESULTS TABLE ---
+                import pandas as pd
                 st.markdown("### 📊 SIMULATION DATA LOG")
-                df_log = pd.DataFrame(log_data)
+                df_log = pd.DataFrame({
+                    "Phase (%)": (result["phases"] * 100).astype(int),
+                    "Peak Pressure (kPa)": np.round(result["peaks"], 2),
+                    "Applied Load (N)": np.round(result["loads"], 2)
+                })
                 # Display simply as a dataframe
                 st.dataframe(df_log.set_index("Phase (%)"), use_container_width=True, height=200)
 
                 with st.expander("📉 DURABILITY REPORT", expanded=True):
-                    fig_w, ax_w = plt.subplots(figsize=(6, 2))
-                    ax_w.imshow(sim.wear_map, cmap='inferno', aspect='auto')
-                    ax_w.axis('off')
-                    ax_w.set_title("PREDICTED WEAR ZONES", color="white")
-                    st.pyplot(fig_w)
-                    plt.close(fig_w)
-                    
-            except Exception as e:
-                st.error(f"SIMULATION ABORTED: {e}")
+                    st.image(figure_to_png(plot_wear_map(result["wear_map"])), width="stretch")
+                    st.caption(f"Forecast wear-through ({WEAR_THROUGH_MM:g} mm) after ~{int(est_life_km)} km "
+                               f"(closed-form Archard integration, thickness re-solved every 25 km).")
         else:
             st.info("AWAITING INPUT: Press 'EXECUTE' to run dynamics.")
 
     st.markdown("---")
     with st.expander("🤖 AI_INVERSE_DESIGN_MODULE"):
-        c_ai1, c_ai2, c_ai3 = st.columns([1, 1, 1])
+        ai_engine = st.radio("ENGINE", ["Surrogate (Forest)", "Direct Search (CMA-ES)"], horizontal=True)
+        direct_mode = ai_engine.startswith("Direct")
+        c_ai1, c_ai2, c_ai4, c_ai3 = st.columns([1, 1, 1, 1])
         with c_ai1: target_score = st.number_input("TARGET SCORE", 0, 100, 90)
         with c_ai2: target_weight = st.number_input("USER WEIGHT (kg)", 40, 150, 75)
+        with c_ai4:
+            if direct_mode: solve_budget = st.number_input("SOLVE BUDGET", 24, 5000, 400, step=12)
+            else: n_train = st.number_input("TRAINING SAMPLES", 50, 50000, 50, step=50)
         with c_ai3:
             st.markdown("<br>", unsafe_allow_html=True)
             if st.button("GENERATE OPTIMIZATION"):
-                try:
-                    with st.spinner("NEURAL NETWORK COMPUTING..."):
-                        best, pred = run_inverse_design(sim, target_weight, target_score)
-                    st.code(f"OPTIMIZATION RESULT\nHEEL: {best[0]}mm | FORE: {best[1]}mm | ARCH: {best[2]}x | MOD: {best[3]} | SCORE: {pred:.1f}")
-                    st.success("AI SOLUTION FOUND")
-                except Exception as e:
-                    st.error(f"AI MODULE FAILURE: {e}")
+                budget = solve_budget if direct_mode else n_train
+                sim = design_engine(p_gait, p_heel, p_fore, p_arch, p_modulus, p_groove, p_wear_factor)
+                # The forest learns from every query, so its jobs are only shared while the store is unchanged
+                store_size = None if direct_mode else get_surrogate_store().n_samples(sim)
+                submit_job("ai", ("design", p_gait, target_weight, target_score, ai_engine, budget, store_size),
+                           optimize_design, sim, target_weight, target_score, direct_mode, budget)
+            ai_job = session_job("ai")
+            if ai_job is not None and ai_job.active:
+                job_status("ai", f"OPTIMIZING FOR {target_weight}kg")
+            elif ai_job is not None and ai_job.status == "failed":
+                st.error(f"AI MODULE FAILURE: {ai_job.error}")
+            elif ai_job is not None and ai_job.status == "done":
+                best, pred, n_evals = ai_job.result
+                result = f"OPTIMIZATION RESULT\nHEEL: {best[0]}mm | FORE: {best[1]}mm | ARCH: {best[2]}x | MOD: {best[3]} | SCORE: {pred:.1f}"
+                if n_evals is not None:
+                    result += f"\nTREAD: {best[4]} | SOLVES: {n_evals}"
+                st.code(result)
+                st.success("AI SOLUTION FOUND")
+
+    with st.expander("📈 PARETO_DESIGN_SWEEP"):
+        n_candidates = len(MATERIALS) * len(GROOVE_TYPES)
+        c_sw1, c_sw2, c_sw3, c_sw4 = st.columns([1, 1, 1, 1])
+        with c_sw1: n_geo = st.number_input("GEOMETRIES", 100, 20000, 5000, step=100)
+        objective_names = [name for name, _ in PARETO_OBJECTIVES]
+        with c_sw2: axis_x = st.selectbox("X AXIS", objective_names, index=2)
+        with c_sw3: axis_y = st.selectbox("Y AXIS", objective_names, index=0)
+        with c_sw4:
+            st.markdown("<br>", unsafe_allow_html=True)
+            run_sweep = st.button("RUN SWEEP")
+        st.caption(f"{n_geo * n_candidates:,} candidates: every geometry x material x tread pattern at {p_weight} kg, {p_gait}. "
+                   "Life is the constant-rate wear-through estimate; the dashboard forecast re-solves the worn sole.")
+        if run_sweep:
+            try:
+                with st.spinner("SWEEPING DESIGN SPACE..."):
+                    sweep = cached("sweep_designs", sweep_designs, p_gait, p_weight, n_geo, 0)
+                st.plotly_chart(create_pareto_plot(sweep, axis_x, axis_y), use_container_width=True)
+                import pandas as pd
+                front = sweep["pareto"]
+                st.dataframe(pd.DataFrame({k: v[front] for k, v in sweep.items() if k != "pareto"})
+                             .sort_values("comfort", ascending=False), use_container_width=True, height=250)
+                st.success(f"PARETO FRONT: {int(front.sum())} of {len(front):,} designs non-dominated")
+            except Exception as e:
+                st.error(f"SWEEP FAILURE: {e}")
+
+# --- DIAGNOSTICS PANEL ---
+def show_diagnostics(profiler):
+    import pandas as pd
+    with st.sidebar:
+        st.markdown("### 🩺 DIAGNOSTICS")
+        summary = profiler.summary()
+        if summary:
+            st.dataframe(pd.DataFrame(summary).set_index("span").round(3), use_container_width=True)
+        else:
+            st.caption("No spans recorded yet.")
+        if profiler.counters:
+            st.dataframe(pd.Series(profiler.counters, name="count"), use_container_width=True)
+        st.caption(f"{len(profiler.events)} / {profiler.events.maxlen} spans buffered this session")
+        d1, d2 = st.columns(2)
+        d1.download_button("JSON", profiler.to_json(), "solesim_profile.json", "application/json")
+        d2.download_button("TRACE", profiler.to_chrome_trace(), "solesim_trace.json", "application/json",
+                           help="Chrome trace format (chrome://tracing or ui.perfetto.dev)")
+        if st.button("RESET DIAGNOSTICS"):
+            profiler.reset()
 
 if st.session_state.page == 'landing': show_landing_page()
-elif st.session_state.page == 'dashboard': show_dashboard()
+elif st.session_state.page == 'dashboard':
+    # Per-session ring buffer; library spans report to it while diagnostics are on
+    profiler = st.session_state.setdefault("profiler", profiling.Profiler())
+    profiler.enabled = st.session_state.get("diagnostics", False)
+    profiling.activate(profiler)
+    with profiling.span("app.run"):
+        show_dashboard()
+    if profiler.enabled:
+        show_diagnostics(profiler)
@@ -1,41 +1,288 @@
+import contextvars
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-import streamlit as st
-
-def run_inverse_design(sim, weight_kg, target_score):
-    progress_text = f"Training AI for {weight_kg}kg body weight..."
-    my_bar = st.progress(0, text=progress_text)
-    
-    X_train, y_train = [], []
-    for i in range(50):
-        r_heel = int(np.random.uniform(5, 50))
-        r_fore = int(np.random.uniform(5, 50))
-        r_arch = round(np.random.uniform(0.5, 5.0), 1)
-        r_mod = int(np.random.uniform(10, 100))
-        r_weight = int(np.random.uniform(40, 120))
-        
-        sim.update_design(r_heel, r_fore, r_arch, r_mod, "None")
-        p_map = sim.solve_static(r_weight)
-        score = max(100 - (np.max(p_map) * 2.5), 0)
-        
-        X_train.append([score, r_weight])
-        y_train.append([r_heel, r_fore, r_arch, r_mod])
-        my_bar.progress((i+1)/50)
-        
-    rf = RandomForestRegressor(n_estimators=100)
-    rf.fit(X_train, y_train)
-    
-    pred = rf.predict([[target_score, weight_kg]])[0]
-    best_design = [
-        int(np.clip(pred[0], 5, 50)),
-        int(np.clip(pred[1], 5, 50)),
-        round(np.clip(pred[2], 0.5, 5.0), 1),
-        int(np.clip(pred[3], 10, 100))
-    ]
-    
+from modules import profiling
+from modules.jobs import process_pool
+from modules.physics import comfort_score, SIMULATOR_VERSION, GROOVE_TYPES
+
+# scikit-learn and joblib are only imported once a forest is loaded or trained,
+# so the direct engine, sampling workers and the app's cold start skip them.
+
+# --- PERSISTENT SURROGATE STORE ---
+SURROGATE_DIR = os.environ.get("SOLESIM_CACHE_DIR", ".solesim_cache")
+REFIT_EVERY = 25  # new samples needed before the forest is retrained
+FOREST_PARAMS = {"n_estimators": 100, "min_samples_leaf": 5}  # leaf floor keeps the saved model ~7 MB per 10k samples
+
+# Search space shared by both inverse-design engines: heel, fore, arch, modulus
+DESIGN_BOUNDS = np.array([(5, 50), (5, 50), (0.5, 5.0), (10, 100)], dtype=float)
+
+def clip_design(values):
+    lo, hi = DESIGN_BOUNDS[:, 0], DESIGN_BOUNDS[:, 1]
+    v = np.clip(np.asarray(values, dtype=float), lo, hi)
+    return [int(v[0]), int(v[1]), round(v[2], 1), int(v[3])]
+
+def generate_samples(sim, n_samples, rng=None):
+    rng = np.random.default_rng() if rng is None else rng
+    r_heel = rng.uniform(5, 50, n_samples).astype(int)
+    r_fore = rng.uniform(5, 50, n_samples).astype(int)
+    r_arch = np.round(rng.uniform(0.5, 5.0, n_samples), 1)
+    r_mod = rng.uniform(10, 100, n_samples).astype(int)
+    r_weight = rng.uniform(40, 120, n_samples).astype(int)
+
+    # One vectorized pass over all candidate designs
+    results = sim.solve_static_batch(r_heel, r_fore, r_arch, r_mod, r_weight, "None")
+
+    X = np.column_stack([results["comfort_score"], r_weight])
+    y = np.column_stack([r_heel, r_fore, r_arch, r_mod])
+    return X, y
+
+def _sample_chunk(sim, n_samples, seed_seq):
+    return generate_samples(sim, n_samples, np.random.default_rng(seed_seq))
+
+@profiling.traced("ai.sample")
+def generate_samples_parallel(sim, n_samples, n_workers=None, chunk_size=2000, seed=None,
+                              backend="process", progress_callback=None):
+    # Each chunk gets its own spawned seed, so output is identical for any worker count
+    chunks = [min(chunk_size, n_samples - lo) for lo in range(0, n_samples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    results = [None] * len(chunks)
+    done = 0
+
+    def report(i, res):
+        nonlocal done
+        results[i] = res
+        done += chunks[i]
+        if progress_callback is not None:
+            progress_callback(done, n_samples)
+
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    if n_workers <= 1 or len(chunks) <= 1:
+        for i, n in enumerate(chunks):
+            report(i, _sample_chunk(sim, n, seeds[i]))
+    else:
+        n_workers = min(n_workers, len(chunks))
+        with (process_pool(n_workers) if backend == "process" else ThreadPoolExecutor(n_workers)) as pool:
+            futures = {pool.submit(_sample_chunk, sim, n, seeds[i]): i for i, n in enumerate(chunks)}
+            try:
+                for fut in as_completed(futures):
+                    report(futures[fut], fut.result())
+            except BaseException:
+                # e.g. a cancelled job raising from progress_callback: drop the queued chunks
+                for fut in futures:
+                    fut.cancel()
+                raise
+
+    if not results:
+        return np.empty((0, 2)), np.empty((0, 4))
+    return np.vstack([r[0] for r in results]), np.vstack([r[1] for r in results])
+
+class SurrogateStore:
+    # Training data and fitted forest per (simulator version, grid, gait), kept in
+    # memory and on disk. Samples are appended to a raw float64 file (X | y rows);
+    # the forest is saved compressed after each fit. A forest that is only stale is
+    # retrained on a background thread while queries keep using the current one.
+    def __init__(self, cache_dir=SURROGATE_DIR, refit_every=REFIT_EVERY):
+        self.cache_dir = cache_dir
+        self.refit_every = refit_every
+        self._entries = {}
+        self._lock = threading.RLock()
+
+    def key(self, sim):
+        gait = re.sub(r"\W+", "_", sim.gait_type).strip("_").lower()
+        return f"surrogate_v{SIMULATOR_VERSION}_{sim.nx}x{sim.ny}_dx{sim.dx:g}_{gait}"
+
+    def _path(self, key, ext):
+        return os.path.join(self.cache_dir, key + ext)
+
+    def load(self, sim):
+        key = self.key(sim)
+        with self._lock:
+            if key not in self._entries:
+                entry = {"X": np.empty((0, 2)), "y": np.empty((0, 4)), "model": None, "n_fit": 0,
+                         "refitting": False}
+                data_path = self._path(key, ".f64")
+                if os.path.exists(data_path):
+                    rows = np.fromfile(data_path)
+                    # A row still being appended by another process is left for the next load
+                    rows = rows[:len(rows) // 6 * 6].reshape(-1, 6)
+                    entry["X"], entry["y"] = rows[:, :2], rows[:, 2:]
+                self._entries[key] = entry
+            return self._entries[key]
+
+    def n_samples(self, sim):
+        return len(self.load(sim)["X"])
+
+    def add_samples(self, sim, X, y):
+        X, y = np.asarray(X, dtype=float), np.asarray(y, dtype=float)
+        with self._lock:
+            entry = self.load(sim)
+            entry["X"] = np.vstack([entry["X"], X])
+            entry["y"] = np.vstack([entry["y"], y])
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # One append per batch; the stored rows are never rewritten
+            with open(self._path(self.key(sim), ".f64"), "ab") as f:
+                f.write(np.column_stack([X, y]).tobytes())
+
+    def fit(self, sim, force=False):
+        # Blocks only when there is no forest yet (or force); returns the forest to query
+        with self._lock:
+            entry = self.load(sim)
+            # The saved forest is read here rather than in load(), so counting samples never imports joblib
+            model_path = self._path(self.key(sim), ".joblib")
+            if entry["model"] is None and os.path.exists(model_path):
+                import joblib
+                entry["model"], entry["n_fit"] = joblib.load(model_path)
+            n = len(entry["X"])
+            if n and (force or entry["model"] is None):
+                self._fit(self.key(sim), entry, entry["X"], entry["y"])
+            elif self.refit_every and n - entry["n_fit"] >= self.refit_every and not entry["refitting"]:
+                entry["refitting"] = True
+                ctx = contextvars.copy_context()
+                threading.Thread(target=ctx.run, args=(self._refit, self.key(sim), entry, entry["X"], entry["y"]),
+                                 name="solesim-refit", daemon=True).start()
+            return entry["model"]
+
+    def _refit(self, key, entry, X, y):
+        try:
+            self._fit(key, entry, X, y)
+        finally:
+            entry["refitting"] = False
+
+    def _fit(self, key, entry, X, y):
+        from sklearn.ensemble import RandomForestRegressor
+        import joblib
+        rf = RandomForestRegressor(**FOREST_PARAMS)
+        with profiling.span("ai.train", samples=len(X)):
+            rf.fit(X, y)
+        # Installed and renamed into place only if no newer fit has landed meanwhile
+        os.makedirs(self.cache_dir, exist_ok=True)
+        model_path = self._path(key, ".joblib")
+        tmp_path = f"{model_path}.{threading.get_ident()}.tmp"
+        joblib.dump((rf, len(X)), tmp_path, compress=3)
+        with self._lock:
+            if len(X) < entry["n_fit"]:
+                os.remove(tmp_path)
+                return
+            entry["model"], entry["n_fit"] = rf, len(X)
+            os.replace(tmp_path, model_path)
+
+_default_store = None
+
+def get_surrogate_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = SurrogateStore()
+    return _default_store
+
+@profiling.traced("ai.inverse_design")
+def run_inverse_design(sim, weight_kg, target_score, store=None, n_samples=50,
+                       n_workers=1, backend="process", progress_callback=None):
+    store = get_surrogate_store() if store is None else store
+
+    # Only simulate/train while the stored dataset is smaller than requested
+    missing = n_samples - store.n_samples(sim)
+    if missing > 0:
+        X_new, y_new = generate_samples_parallel(sim, missing, n_workers=n_workers, backend=backend,
+                                                 progress_callback=progress_callback)
+        store.add_samples(sim, X_new, y_new)
+        store.fit(sim, force=True)
+    rf = store.fit(sim)
+
+    with profiling.span("ai.predict"):
+        pred = rf.predict([[target_score, weight_kg]])[0]
+    best_design = clip_design(pred)
+
     sim.update_design(*best_design, "None")
     p_map_v = sim.solve_static(weight_kg)
-    real_score = max(100 - (np.max(p_map_v) * 2.5), 0)
-    
-    my_bar.empty()
-    return best_design, real_score
\ No newline at end of file
+    real_score = float(comfort_score(np.max(p_map_v)))
+
+    # The verification solve is a free, well-placed training sample
+    store.add_samples(sim, [[real_score, weight_kg]], [best_design])
+    return best_design, real_score
+
+# --- DIRECT SEARCH (CMA-ES) ---
+def _decode_designs(x, groove_type):
+    # x lives in the unit cube; rounded like the reported designs so scores are exact
+    lo, hi = DESIGN_BOUNDS[:, 0], DESIGN_BOUNDS[:, 1]
+    v = lo + x[:, :4] * (hi - lo)
+    heel, fore, mod = v[:, 0].astype(int), v[:, 1].astype(int), v[:, 3].astype(int)
+    arch = np.round(v[:, 2], 1)
+    if groove_type is None:
+        grooves = np.array(GROOVE_TYPES)[np.minimum((x[:, 4] * len(GROOVE_TYPES)).astype(int), len(GROOVE_TYPES) - 1)]
+    else:
+        grooves = np.full(len(x), groove_type)
+    return heel, fore, arch, mod, grooves
+
+@profiling.traced("ai.direct_design")
+def run_direct_design(sim, weight_kg, target_score, groove_type=None, budget=400, popsize=12,
+                      tol=0.5, seed=None, progress_callback=None):
+    # Searches the design space directly against the batch solver; groove is
+    # optimised too unless fixed. Stops once |score - target| <= tol or budget is spent.
+    rng = np.random.default_rng(seed)
+    d = 4 if groove_type is not None else 5
+    lam, mu = popsize, popsize // 2
+    w = np.log(mu + 0.5) - np.log(np.arange(1, mu + 1))
+    w /= w.sum()
+    mueff = 1 / np.sum(w**2)
+    cc = (4 + mueff / d) / (d + 4 + 2 * mueff / d)
+    cs = (mueff + 2) / (d + mueff + 5)
+    c1 = 2 / ((d + 1.3)**2 + mueff)
+    cmu = min(1 - c1, 2 * (mueff - 2 + 1 / mueff) / ((d + 2)**2 + mueff))
+    damps = 1 + 2 * max(0, np.sqrt((mueff - 1) / (d + 1)) - 1) + cs
+    chi_n = np.sqrt(d) * (1 - 1 / (4 * d) + 1 / (21 * d**2))
+
+    mean = rng.uniform(0.3, 0.7, d)
+    sigma = 0.3
+    C = np.eye(d)
+    pc, ps = np.zeros(d), np.zeros(d)
+    best_err, best = np.inf, None
+    evals, gen = 0, 0
+
+    while evals < budget and best_err > tol:
+        gen += 1
+        eigvals, B = np.linalg.eigh(C)
+        D = np.sqrt(np.maximum(eigvals, 1e-20))
+        n = min(lam, budget - evals)
+        z = rng.standard_normal((n, d))
+        x = np.clip(mean + sigma * (z * D) @ B.T, 0, 1)
+
+        heel, fore, arch, mod, grooves = _decode_designs(x, groove_type)
+        res = sim.solve_static_batch(heel, fore, arch, mod, weight_kg, grooves)
+        err = np.abs(res["comfort_score"] - target_score)
+        evals += n
+        if progress_callback is not None:
+            progress_callback(evals, budget)
+
+        i = int(np.argmin(err))
+        if err[i] < best_err:
+            best_err = err[i]
+            best = ([int(heel[i]), int(fore[i]), float(arch[i]), int(mod[i]), str(grooves[i])],
+                    float(res["comfort_score"][i]))
+        if n < mu:
+            break
+
+        # Standard CMA-ES update on the repaired (clipped) samples
+        order = np.argsort(err)[:mu]
+        y_sel = (x[order] - mean) / sigma
+        y_w = w @ y_sel
+        mean = mean + sigma * y_w
+        inv_sqrt_c = B @ np.diag(1 / D) @ B.T
+        ps = (1 - cs) * ps + np.sqrt(cs * (2 - cs) * mueff) * inv_sqrt_c @ y_w
+        hsig = np.linalg.norm(ps) / np.sqrt(1 - (1 - cs)**(2 * gen)) / chi_n < 1.4 + 2 / (d + 1)
+        pc = (1 - cc) * pc + hsig * np.sqrt(cc * (2 - cc) * mueff) * y_w
+        C = ((1 - c1 - cmu) * C
+             + c1 * (np.outer(pc, pc) + (1 - hsig) * cc * (2 - cc) * C)
+             + cmu * (y_sel.T * w) @ y_sel)
+        sigma *= np.exp((cs / damps) * (np.linalg.norm(ps) / chi_n - 1))
+
+        # Collapsed on a local optimum: restart from a fresh random mean
+        if sigma * D.max() < 1e-3:
+            mean, sigma, C = rng.uniform(0.1, 0.9, d), 0.3, np.eye(d)
+            pc, ps, gen = np.zeros(d), np.zeros(d), 0
+
+    best_design, real_score = best
+    sim.update_design(*best_design)
+    return best_design, real_score, evals
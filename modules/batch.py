@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+from modules.jobs import process_pool
+from modules.physics import SoleSimulation, SIMULATOR_VERSION
+from modules.sweep import MATERIALS
+
+# Usage:
+#   python -m modules.batch doe.csv -o results.parquet --walk-phases 20 --workers 8 --maps
+#
+# DOE columns: heel_mm, fore_mm, arch, weight_kg and either modulus or material.
+# Optional: groove (default "None"), gait (default "Neutral"), wear_factor.
+#
+# pandas and pyarrow are imported by the functions that use them, so importing
+# this module (e.g. for pack_map/unpack_map) needs only NumPy.
+
+DOE_DEFAULTS = {"groove": "None", "gait": "Neutral"}
+
+def load_doe(path):
+    import pandas as pd
+    if path.lower().endswith(".json"):
+        with open(path) as f:
+            data = json.load(f)
+        doe = pd.DataFrame(data["designs"] if isinstance(data, dict) else data)
+    else:
+        doe = pd.read_csv(path)
+
+    for col, default in DOE_DEFAULTS.items():
+        # read_csv parses the literal groove name "None" as NaN
+        doe[col] = doe[col].fillna(default) if col in doe else default
+    if "material" in doe:
+        props = doe["material"].map(MATERIALS)
+        if props.isna().any():
+            raise ValueError(f"Unknown material(s): {sorted(set(doe['material'][props.isna()]))}")
+        if "modulus" not in doe:
+            doe["modulus"] = props.map(lambda m: m["mod"])
+        if "wear_factor" not in doe:
+            doe["wear_factor"] = props.map(lambda m: m["wear"])
+    if "wear_factor" not in doe:
+        doe["wear_factor"] = 0.01
+
+    missing = [c for c in ("heel_mm", "fore_mm", "arch", "modulus", "weight_kg") if c not in doe]
+    if missing:
+        raise ValueError(f"DOE is missing column(s): {missing}")
+    doe.insert(0, "design_id", np.arange(len(doe)))
+    return doe
+
+def pack_map(arr):
+    # float32 bytes; Parquet's column codec does the compression
+    return np.ascontiguousarray(arr, dtype=np.float32).tobytes()
+
+def unpack_map(blob, ny, nx):
+    return np.frombuffer(blob, dtype=np.float32).reshape(ny, nx)
+
+_engines = {}
+
+def _engine(gait, resolution, dtype):
+    # One engine per gait and resolution per worker process
+    key = (gait, resolution, dtype)
+    if key not in _engines:
+        sim = SoleSimulation(resolution=resolution, dtype=dtype)
+        sim.update_gait(gait)
+        _engines[key] = sim
+    return _engines[key]
+
+def run_chunk(doe, resolution=1.0, walk_phases=20, keep_maps=False, dtype="float64"):
+    import pandas as pd
+    out = []
+    for gait, rows in doe.groupby("gait", sort=False):
+        sim = _engine(gait, resolution, dtype)
+        res = sim.solve_static_batch(rows["heel_mm"].to_numpy(), rows["fore_mm"].to_numpy(),
+                                     rows["arch"].to_numpy(), rows["modulus"].to_numpy(),
+                                     rows["weight_kg"].to_numpy(), rows["groove"].to_numpy(),
+                                     return_maps=walk_phases > 0 or keep_maps)
+        part = rows.copy()
+        for key in ("peak_pressure", "comfort_score", "contact_area_cm2", "penetration", "converged"):
+            part[key] = res[key]
+
+        if walk_phases > 0:
+            peaks, loads, wear = sim.walk_cycle_batch(res["pressure_maps"], rows["weight_kg"].to_numpy(),
+                                                      np.linspace(0, 1, walk_phases),
+                                                      rows["wear_factor"].to_numpy())
+            part["walk_peak_max"] = peaks.max(axis=1)
+            part["walk_peak_mean"] = peaks.mean(axis=1)
+            part["walk_peaks"] = list(peaks.astype(np.float32))
+            part["cycle_wear_max"] = wear.reshape(len(rows), -1).max(axis=1)
+        if keep_maps:
+            part["map_ny"], part["map_nx"] = sim.ny, sim.nx
+            part["pressure_map"] = [pack_map(m) for m in res["pressure_maps"]]
+            if walk_phases > 0:
+                part["wear_map"] = [pack_map(m) for m in wear]
+        out.append(part)
+    return pd.concat(out).sort_values("design_id")
+
+def _run_chunk_args(args):
+    return run_chunk(*args)
+
+def run_batch(doe, output_path, resolution=1.0, walk_phases=20, keep_maps=False,
+              chunk_size=None, n_workers=1, progress_callback=None, dtype="float64"):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    # Default DOE chunks hold one batch-solver chunk, so per-worker memory is bounded at any resolution
+    if chunk_size is None:
+        chunk_size = SoleSimulation(resolution=resolution, dtype=dtype).batch_chunk_size()
+    chunks = [doe.iloc[lo:lo + chunk_size] for lo in range(0, len(doe), chunk_size)]
+    tasks = [(chunk, resolution, walk_phases, keep_maps, dtype) for chunk in chunks]
+    metadata = {b"solesim_version": SIMULATOR_VERSION.encode(), b"resolution": str(resolution).encode()}
+    writer, done = None, 0
+
+    def write(table):
+        nonlocal writer, done
+        table = pa.Table.from_pandas(table, preserve_index=False)
+        if writer is None:
+            schema = table.schema.with_metadata({**(table.schema.metadata or {}), **metadata})
+            writer = pq.ParquetWriter(output_path, schema, compression="zstd")
+        writer.write_table(table.cast(writer.schema))
+        done += table.num_rows
+        if progress_callback is not None:
+            progress_callback(done, len(doe))
+
+    try:
+        if n_workers <= 1 or len(chunks) <= 1:
+            for task in tasks:
+                write(_run_chunk_args(task))
+        else:
+            # map() yields in submission order, so chunks are streamed to disk in DOE order
+            with process_pool(n_workers) as pool:
+                for result in pool.map(_run_chunk_args, tasks):
+                    write(result)
+    finally:
+        if writer is not None:
+            writer.close()
+    return done
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.batch",
+                                     description="Headless SoleSim batch runner (DOE in, Parquet out).")
+    parser.add_argument("doe", help="Design-of-experiments file (.csv or .json)")
+    parser.add_argument("-o", "--output", default="solesim_results.parquet")
+    parser.add_argument("--resolution", type=float, default=1.0, help="Grid cell size in cm")
+    parser.add_argument("--float32", action="store_true", help="Single-precision maps (high-resolution runs)")
+    parser.add_argument("--walk-phases", type=int, default=20, help="Gait phases per walk cycle (0 = static only)")
+    parser.add_argument("--maps", action="store_true", help="Also store pressure and wear maps")
+    parser.add_argument("--chunk-size", type=int, help="Designs per worker task (default: sized to the grid)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    doe = load_doe(args.doe)
+    start = time.perf_counter()
+    n = run_batch(doe, args.output, args.resolution, args.walk_phases, args.maps,
+                  args.chunk_size, args.workers, dtype="float32" if args.float32 else "float64",
+                  progress_callback=lambda done, total: print(f"\r{done}/{total} designs", end="", file=sys.stderr))
+    print(f"\nWrote {n} designs to {args.output} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
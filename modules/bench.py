@@ -0,0 +1,260 @@
+import argparse
+import gc
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from modules.physics import SoleSimulation, SIMULATOR_VERSION
+
+# Usage:
+#   python -m modules.bench                                   # run everything, JSON to stdout
+#   python -m modules.bench -k solve -k walk -o bench.json    # subset, also written to a file
+#   python -m modules.bench --save-baseline bench_baseline.json
+#   python -m modules.bench --baseline bench_baseline.json --threshold 0.2   # exit 1 on regression
+#
+# Each case's setup runs untimed and returns the zero-argument callable that is timed;
+# a cleanup attribute on that callable runs once the case is finished.
+# Timings come first, with GC paused like timeit; peak memory is a separate tracemalloc call.
+
+DESIGN = (25, 15, 1.5, 30)
+WEIGHT = 75
+
+def _sim(resolution=1.0, dtype="float64", gait="Neutral"):
+    sim = SoleSimulation(resolution=resolution, dtype=dtype)
+    sim.update_gait(gait)
+    sim.update_design(*DESIGN)
+    return sim
+
+def _static(resolution, dtype="float64"):
+    def setup():
+        sim = _sim(resolution, dtype)
+        return lambda: sim.solve_static(WEIGHT)
+    return setup
+
+def _update_design():
+    sim = _sim()
+    return lambda: sim.update_design(*DESIGN, "Honeycomb")
+
+def _foot_shape():
+    sim = _sim()
+    return lambda: sim.update_gait("Supinator (High Arch)")
+
+def _static_batch():
+    sim = _sim()
+    rng = np.random.default_rng(0)
+    designs = [rng.uniform(lo, hi, 10000) for lo, hi in ((5, 50), (5, 50), (0.5, 5), (10, 100), (40, 120))]
+    return lambda: sim.solve_static_batch(*designs, "Grid Pattern")
+
+def _walk(phases, resolution=1.0, dtype="float64"):
+    def setup():
+        sim = _sim(resolution, dtype)
+        grid = np.linspace(0, 1, phases)
+
+        def run():
+            # Fresh design each time so the static solve is part of the cycle cost
+            sim.update_design(*DESIGN)
+            return sim.solve_walk_cycle(WEIGHT, grid)
+        return run
+    return setup
+
+def _transient():
+    from modules.dynamics import run_stance
+    sim = _sim()
+    return lambda: run_stance(sim, WEIGHT, 20)
+
+def _inverse(warm):
+    def setup():
+        from modules.ai_optimizer import SurrogateStore, run_inverse_design
+        sim = _sim()
+        tmp = tempfile.TemporaryDirectory(prefix="solesim_bench_")
+        cache_dir = tmp.name
+        if warm:
+            # Stored dataset and fitted forest: only the prediction and verification solve are timed.
+            # Periodic refits are off, so the forest stays frozen however many repeats run.
+            store = SurrogateStore(cache_dir, refit_every=None)
+            run_inverse_design(sim, WEIGHT, 80, store=store, n_samples=500)
+            run = lambda: run_inverse_design(sim, WEIGHT, 80, store=store, n_samples=500)
+        else:
+            def run():
+                # Empty store: sampling, forest training and the verification solve
+                shutil.rmtree(cache_dir, ignore_errors=True)
+                return run_inverse_design(sim, WEIGHT, 80, store=SurrogateStore(cache_dir), n_samples=500)
+        run.cleanup = tmp.cleanup
+        return run
+    return setup
+
+def _direct():
+    from modules.ai_optimizer import run_direct_design
+    sim = _sim()
+    return lambda: run_direct_design(sim, WEIGHT, 80, seed=0)
+
+def _static_heatmap():
+    from modules.visualization import plot_static_heatmap, figure_to_png
+    sim = _sim()
+    pressure = sim.solve_static(WEIGHT)
+    return lambda: figure_to_png(plot_static_heatmap(pressure, float(pressure.max())))
+
+def _topology():
+    from modules.visualization import create_3d_topology
+    pressure = _sim().solve_static(WEIGHT)
+    return lambda: create_3d_topology(pressure).to_json()
+
+def _rgb_frame():
+    from modules.visualization import pressure_to_rgb
+    pressure = _sim().solve_static(WEIGHT)
+    return lambda: pressure_to_rgb(pressure, float(pressure.max()) * 1.5)
+
+def _dynamic_heatmap():
+    from modules.visualization import plot_dynamic_heatmap, figure_to_png
+    pressure = _sim().solve_static(WEIGHT)
+    return lambda: figure_to_png(plot_dynamic_heatmap(pressure, float(pressure.max()) * 1.5), dpi=100)
+
+# name -> (setup, default repeats)
+CASES = {
+    "solve_static_1cm": (_static(1.0), 200),
+    "solve_static_0.5cm": (_static(0.5), 100),
+    "solve_static_0.25cm": (_static(0.25), 50),
+    "solve_static_0.1cm_f32": (_static(0.1, "float32"), 20),
+    "update_design": (_update_design, 200),
+    "generate_foot_shape": (_foot_shape, 200),
+    "solve_static_batch_10k": (_static_batch, 10),
+    "walk_cycle_20": (_walk(20), 100),
+    "walk_cycle_500": (_walk(500), 20),
+    "walk_cycle_100_0.1cm_f32": (_walk(100, 0.1, "float32"), 10),
+    "transient_stance_20": (_transient, 20),
+    "inverse_design_cold": (_inverse(False), 5),
+    "inverse_design_warm": (_inverse(True), 20),
+    "direct_design": (_direct, 10),
+    "figure_static_heatmap_png": (_static_heatmap, 10),
+    "figure_dynamic_heatmap_png": (_dynamic_heatmap, 10),
+    "figure_3d_topology": (_topology, 20),
+    "frame_pressure_to_rgb": (_rgb_frame, 200),
+}
+
+def _measure(fn, repeats, warmup):
+    for _ in range(warmup):
+        fn()
+
+    times = np.empty(repeats)
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for i in range(repeats):
+            start = time.perf_counter_ns()
+            fn()
+            times[i] = time.perf_counter_ns() - start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return times / 1e6, peak
+
+def run_case(setup, repeats, warmup=3):
+    fn = setup()
+    try:
+        times, peak = _measure(fn, repeats, warmup)
+    finally:
+        if hasattr(fn, "cleanup"):
+            fn.cleanup()
+
+    return {
+        "median_ms": float(np.median(times)),
+        "p95_ms": float(np.percentile(times, 95)),
+        "min_ms": float(times.min()),
+        "repeats": repeats,
+        "peak_mem_kb": peak / 1024,
+    }
+
+def run_benchmarks(names=None, repeats=None, warmup=3, progress_callback=None):
+    names = list(CASES) if names is None else names
+    results = {}
+    for i, name in enumerate(names):
+        setup, default_repeats = CASES[name]
+        results[name] = run_case(setup, repeats or default_repeats, warmup)
+        if progress_callback is not None:
+            progress_callback(name, results[name], i + 1, len(names))
+    return {
+        "solesim_version": SIMULATOR_VERSION,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": f"{platform.system()} {platform.machine()}",
+        "results": results,
+    }
+
+def compare(report, baseline, threshold=0.2):
+    # A case regresses when its median latency or peak memory grows by more than threshold
+    rows = []
+    for name, cur in report["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        for metric in ("median_ms", "peak_mem_kb"):
+            ratio = cur[metric] / base[metric] if base[metric] > 0 else 1.0
+            rows.append({"case": name, "metric": metric, "baseline": base[metric], "current": cur[metric],
+                         "ratio": ratio, "regression": ratio > 1 + threshold})
+    return rows
+
+def _select(patterns):
+    if not patterns:
+        return list(CASES)
+    names = [name for name in CASES if any(p in name for p in patterns)]
+    if not names:
+        raise SystemExit(f"No benchmark matches {patterns}; available: {', '.join(CASES)}")
+    return names
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.bench",
+                                     description="SoleSim physics and rendering benchmarks.")
+    parser.add_argument("-k", dest="patterns", action="append", help="Only cases whose name contains this (repeatable)")
+    parser.add_argument("--repeats", type=int, help="Timed calls per case (default: per-case)")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("-o", "--output", help="Write the JSON report here as well as to stdout")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Store this run as the baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare against a stored baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown/growth, e.g. 0.2 = +20%%")
+    parser.add_argument("--list", action="store_true", help="List the available cases and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(CASES))
+        return 0
+
+    def progress(name, res, done, total):
+        print(f"[{done}/{total}] {name:<28} median {res['median_ms']:9.3f} ms  p95 {res['p95_ms']:9.3f} ms  "
+              f"peak {res['peak_mem_kb']:10.1f} KiB", file=sys.stderr)
+
+    report = run_benchmarks(_select(args.patterns), args.repeats, args.warmup, progress)
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["threshold"] = args.threshold
+        report["comparison"] = compare(report, baseline, args.threshold)
+        for row in report["comparison"]:
+            if row["regression"]:
+                status = 1
+                print(f"REGRESSION {row['case']} {row['metric']}: {row['baseline']:.3f} -> {row['current']:.3f} "
+                      f"(x{row['ratio']:.2f})", file=sys.stderr)
+        if status == 0:
+            print(f"No regressions beyond +{args.threshold:.0%}", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                f.write(text + "\n")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import numpy as np
+from modules import profiling
+from modules.physics import gait_focus
+
+# --- TRANSIENT SPRING-DAMPER GAIT ENGINE ---
+# The foot is a rigid body of the user's mass pressing into a Winkler field of
+# Kelvin-Voigt cells (spring k, damper c = DAMPING_S * k) while the load focus
+# rolls heel to toe. Each cell only pushes (no adhesion). Steps are backward
+# Euler, so large dt stays stable, and each one is an exact O(contact cells)
+# solve over the breakpoint-sorted cells.
+STANCE_S = 0.6            # heel strike to toe-off
+LANDING_VELOCITY = 0.3    # m/s downward at heel strike
+DAMPING_S = 0.015         # foam relaxation time, roughly half-critical at 75 kg
+
+def _cell_pressure(z, v, k, tau, b, g):
+    sigma = g * k * ((z - b) + tau * v)
+    sigma[(z <= b) | (sigma < 0)] = 0
+    return sigma
+
+def _implicit_step(z, v, h, k, tau, b, g, mass, drive, area):
+    # Backward Euler: M (z1 - z - h v) / h^2 + R(z1) = drive, with v1 = (z1 - z) / h.
+    # With c = tau * k, cell i pushes with w_i (z1 - b'_i) once z1 > e_i = max(b_i, b'_i),
+    # where w_i = g k (1 + tau/h) and b'_i = (b_i + tau z / h) / (1 + tau/h). Both e and
+    # b' keep the breakpoint order, so R(z1) is monotone piecewise linear over the
+    # already-sorted cells and the exact root comes from prefix sums in one pass.
+    alpha = 1 + tau / h
+    b_eff = (b + (tau / h) * z) / alpha
+    e = np.maximum(b, b_eff)
+    w = g * k * alpha
+    w_cum = np.concatenate(([0.0], np.cumsum(w)))
+    wb_cum = np.concatenate(([0.0], np.cumsum(w * b_eff)))
+
+    m_eff = mass / (1000 * h * h)  # z in mm, forces in N
+    # Residual just below each engagement point, with only the earlier cells active
+    f_before = m_eff * (e - z - h * v) + area * (w_cum[:-1] * e - wb_cum[:-1]) - drive
+    n = int(np.sum(f_before < 0))
+    z1 = (drive + m_eff * (z + h * v) + area * wb_cum[n]) / (m_eff + area * w_cum[n])
+    if n:
+        # Root inside the jump where cell n-1 engages
+        z1 = max(z1, e[n - 1])
+    return z1, (z1 - z) / h
+
+def stream_stance(sim, weight_kg, n_frames=20, stance_s=STANCE_S, dt=0.002,
+                  landing_velocity=LANDING_VELOCITY, damping_s=DAMPING_S):
+    # Yields (phase, pressure_frame, peak, load_N) at n_frames evenly spaced
+    # phases. peak is the highest cell pressure over all internal steps since the
+    # previous frame, so impact transients between frames are not lost.
+    idx, b, k, x = sim.contact_cells()
+    tau = damping_s
+    area = sim.dx ** 2
+    drive = weight_kg * 9.81
+    z = b[0] if b.size else 0.0
+    v = landing_velocity * 1000
+    t, peak = 0.0, 0.0
+
+    for phase in np.linspace(0, 1, n_frames):
+        t_frame = phase * stance_s
+        while b.size and t < t_frame - 1e-12:
+            h = min(dt, t_frame - t)
+            g = gait_focus(x, (t + h) / stance_s)[0]
+            z, v = _implicit_step(z, v, h, k, tau, b, g, weight_kg, drive, area)
+            t += h
+            peak = max(peak, float(_cell_pressure(z, v, k, tau, b, g).max()))
+
+        frame = np.zeros((sim.ny, sim.nx), dtype=sim.dtype)
+        if b.size:
+            sigma = _cell_pressure(z, v, k, tau, b, gait_focus(x, phase)[0])
+            frame.ravel()[idx] = sigma
+            peak = max(peak, float(sigma.max()))
+            load = float(sigma.sum()) * area
+        else:
+            load = 0.0
+        yield phase, frame, peak, load
+        peak = 0.0
+
+@profiling.traced("physics.transient_stance")
+def run_stance(sim, weight_kg, n_frames=20, progress_callback=None, **kwargs):
+    frames, peaks, loads = [], [], []
+    for _, frame, peak, load in stream_stance(sim, weight_kg, n_frames, **kwargs):
+        frames.append(frame)
+        peaks.append(peak)
+        loads.append(load)
+        if progress_callback is not None:
+            progress_callback(len(frames), n_frames)
+    return np.stack(frames), np.array(peaks), np.array(loads)
@@ -0,0 +1,136 @@
+import contextvars
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# --- BACKGROUND JOBS ---
+# Long runs (walk cycles, inverse design) execute on a shared thread pool so the
+# Streamlit script thread only submits and polls. Jobs are keyed by their
+# parameters: an identical request joins the queued/running/finished job instead
+# of starting another, and each job keeps the set of subscribers (sessions) following
+# it. Progress and cancellation ride on the progress_callback hooks the simulation
+# functions already take.
+
+def process_pool(max_workers):
+    # Workers start from a fork server (spawn where there is none), never from a fork
+    # of this threaded process, whose held locks could deadlock the child
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(method))
+
+class JobCancelled(Exception):
+    pass
+
+class Job:
+    ACTIVE = ("queued", "running")
+
+    def __init__(self, job_id, key, label=""):
+        self.id = job_id
+        self.key = key
+        self.label = label
+        self.status = "queued"
+        self.done_units, self.total_units = 0, 0
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = self.finished = None
+        self.subscribers = set()
+        self.cancel_requests = set()
+        self.future = None
+        self._cancel = threading.Event()
+
+    @property
+    def active(self):
+        return self.status in self.ACTIVE
+
+    @property
+    def progress(self):
+        return min(self.done_units / self.total_units, 1.0) if self.total_units else 0.0
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def progress_callback(self, done, total):
+        # Also the cancellation point: the running function unwinds from here
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.done_units, self.total_units = done, total
+
+class JobManager:
+    def __init__(self, max_workers=None, keep_finished=64):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.keep_finished = keep_finished
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="solesim-job")
+        self._jobs = {}
+        self._by_key = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, subscriber=None, label="", **kwargs):
+        # fn is called as fn(*args, progress_callback=..., **kwargs); resubmitting is idempotent per subscriber
+        with self._lock:
+            job = self._by_key.get(key)
+            if job is None or job.status in ("failed", "cancelled") or job._cancel.is_set():
+                job = Job(next(self._ids), key, label)
+                self._jobs[job.id] = job
+                self._by_key[key] = job
+                # Runs in the submitter's context, so profiling spans land in its session
+                ctx = contextvars.copy_context()
+                job.future = self._pool.submit(ctx.run, self._run, job, fn, args, kwargs)
+                self._prune()
+            job.subscribers.add(subscriber)
+            job.cancel_requests.discard(subscriber)
+            return job
+
+    def _run(self, job, fn, args, kwargs):
+        if job._cancel.is_set():
+            job.status, job.finished = "cancelled", time.time()
+            return
+        job.status, job.started = "running", time.time()
+        try:
+            job.result = fn(*args, progress_callback=job.progress_callback, **kwargs)
+            # Stages without a progress hook (e.g. the forest fit) run to completion; drop their result
+            job.status = "cancelled" if job._cancel.is_set() else "done"
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            job.error = e
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def release(self, job, subscriber=None):
+        # The subscriber stops following the job (its slot was reused)
+        with self._lock:
+            job.subscribers.discard(subscriber)
+            job.cancel_requests.discard(subscriber)
+            self._stop_if_unwanted(job)
+
+    def cancel(self, job, subscriber=None):
+        # The subscriber keeps following the job; the run stops once every subscriber
+        # has asked. True when it is stopped, stopping or already finished.
+        with self._lock:
+            job.cancel_requests.add(subscriber)
+            self._stop_if_unwanted(job)
+            return not job.active or job._cancel.is_set()
+
+    def _stop_if_unwanted(self, job):
+        if job.active and job.subscribers <= job.cancel_requests:
+            job._cancel.set()
+            if job.future.cancel():
+                job.status, job.finished = "cancelled", time.time()
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if not job.active]
+        for job in sorted(finished, key=lambda j: j.finished or 0)[:max(len(finished) - self.keep_finished, 0)]:
+            del self._jobs[job.id]
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
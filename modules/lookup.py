@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+from modules.jobs import process_pool
+from modules.physics import SoleSimulation, SIMULATOR_VERSION, GAIT_TYPES, GROOVE_TYPES
+
+# Usage:
+#   python -m modules.lookup --workers 4
+#
+# Builds a (gait, groove, heel, fore, arch, modulus, weight, [peak, comfort]) float32
+# table from the batch solver. Queries memory-map it and interpolate multilinearly.
+
+TABLE_PATH = os.path.join(os.environ.get("SOLESIM_CACHE_DIR", ".solesim_cache"), "comfort_table.npy")
+
+# (low, high, nodes) per continuous axis. Peak pressure kinks where the peak cell
+# moves with stack height, so heel/fore get the finer 2.5 mm spacing. Against exact solves of
+# random designs: mean 0.3, p95 1.3, max ~6 comfort points.
+TABLE_AXES = {
+    "heel_mm": (5, 50, 19),
+    "fore_mm": (5, 50, 19),
+    "arch": (0.5, 5.0, 10),
+    "modulus": (10, 100, 10),
+    "weight_kg": (40, 120, 9),
+}
+
+def _meta_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+def _build_slice(gait, groove, resolution, axes):
+    sim = SoleSimulation(resolution=resolution)
+    sim.update_gait(gait)
+    grid = np.meshgrid(*[np.linspace(*axes[name]) for name in TABLE_AXES], indexing="ij")
+    res = sim.solve_static_batch(*[g.ravel() for g in grid], groove)
+    shape = grid[0].shape + (2,)
+    return np.stack([res["peak_pressure"], res["comfort_score"]], axis=-1).reshape(shape).astype(np.float32)
+
+def _build_slice_args(args):
+    return _build_slice(*args)
+
+def build_table(path=TABLE_PATH, resolution=1.0, axes=TABLE_AXES, n_workers=1, progress_callback=None):
+    axes = {name: tuple(axes[name]) for name in TABLE_AXES}
+    tasks = [(gait, groove, resolution, axes) for gait in GAIT_TYPES for groove in GROOVE_TYPES]
+    shape = (len(GAIT_TYPES), len(GROOVE_TYPES)) + tuple(n for _, _, n in axes.values()) + (2,)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Filled in place on disk, then renamed so readers never map a partial table
+    table = np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=np.float32, shape=shape)
+
+    def write(i, block):
+        table[divmod(i, len(GROOVE_TYPES))] = block
+        if progress_callback is not None:
+            progress_callback(i + 1, len(tasks))
+
+    if n_workers <= 1:
+        for i, task in enumerate(tasks):
+            write(i, _build_slice_args(task))
+    else:
+        with process_pool(n_workers) as pool:
+            for i, block in enumerate(pool.map(_build_slice_args, tasks)):
+                write(i, block)
+    table.flush()
+    del table
+    os.replace(path + ".tmp", path)
+
+    meta = {"solesim_version": SIMULATOR_VERSION, "resolution": resolution,
+            "gaits": GAIT_TYPES, "grooves": GROOVE_TYPES, "axes": axes}
+    with open(_meta_path(path), "w") as f:
+        json.dump(meta, f, indent=2)
+    return shape
+
+class ComfortTable:
+    def __init__(self, path=TABLE_PATH):
+        with open(_meta_path(path)) as f:
+            meta = json.load(f)
+        self.version = meta["solesim_version"]
+        self.resolution = meta["resolution"]
+        self.gaits = {g: i for i, g in enumerate(meta["gaits"])}
+        self.grooves = {g: i for i, g in enumerate(meta["grooves"])}
+        self.axes = [tuple(meta["axes"][name]) for name in TABLE_AXES]
+        self.table = np.load(path, mmap_mode="r")
+
+    def covers(self, gait, groove):
+        return gait in self.gaits and groove in self.grooves
+
+    def query(self, heel_mm, fore_mm, arch_stiff, modulus, weight_kg, gait="Neutral", groove="None"):
+        # Returns (peak pressure, comfort score); inputs outside the table are clamped to its edges
+        index, frac = [self.gaits[gait], self.grooves[groove]], []
+        for v, (lo, hi, n) in zip((heel_mm, fore_mm, arch_stiff, modulus, weight_kg), self.axes):
+            t = (min(max(v, lo), hi) - lo) / (hi - lo) * (n - 1)
+            i = min(int(t), n - 2)
+            index.append(slice(i, i + 2))
+            frac.append(t - i)
+
+        # Only the 2^5 surrounding nodes are read, then contracted one axis at a time
+        block = np.array(self.table[tuple(index)], dtype=float)
+        for t in frac:
+            block = block[0] + t * (block[1] - block[0])
+        return float(block[0]), float(block[1])
+
+def open_comfort_table(path=TABLE_PATH, resolution=1.0):
+    # None when the table has not been built or is stale for this simulator
+    if not (os.path.exists(path) and os.path.exists(_meta_path(path))):
+        return None
+    table = ComfortTable(path)
+    if table.version != SIMULATOR_VERSION or table.resolution != resolution:
+        return None
+    return table
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.lookup",
+                                     description="Build the precomputed SoleSim comfort lookup table.")
+    parser.add_argument("-o", "--output", default=TABLE_PATH)
+    parser.add_argument("--resolution", type=float, default=1.0, help="Grid cell size in cm")
+    for name, (lo, hi, n) in TABLE_AXES.items():
+        parser.add_argument(f"--{name.replace('_', '-')}-nodes", type=int, default=n,
+                            help=f"Nodes between {lo} and {hi}")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    axes = {name: (lo, hi, getattr(args, f"{name}_nodes")) for name, (lo, hi, _) in TABLE_AXES.items()}
+    start = time.perf_counter()
+    shape = build_table(args.output, args.resolution, axes, args.workers,
+                        progress_callback=lambda done, total: print(f"\r{done}/{total} slices", end="", file=sys.stderr))
+    print(f"\nWrote {np.prod(shape[:-1]):,} designs to {args.output} in {time.perf_counter() - start:.1f}s",
+          file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
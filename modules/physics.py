@@ -1,83 +1,284 @@
 import numpy as np
+from modules import profiling
+
+# Bump whenever solver output changes so persisted surrogates/tables are rebuilt
+SIMULATOR_VERSION = "2"
+
+GROOVE_TYPES = ["None", "Horizontal Sipes", "Grid Pattern", "Honeycomb"]
+GAIT_TYPES = ["Neutral", "Overpronator (Flat Foot)", "Supinator (High Arch)"]
+
+# Grid cells per batch chunk: ~8 MB per float64 working array whatever the resolution
+BATCH_CELL_BUDGET = 2**20
+
+def comfort_score(peak_pressure):
+    return np.maximum(100 - (np.asarray(peak_pressure) * 2.5), 0)
+
+def gait_focus(x_cm, phases):
+    # Load focus rolling heel (x=5 cm) to toe (x=25 cm) over the gait cycle: (phases, len(x))
+    center_x = 5 + (np.atleast_1d(phases) * 20)
+    return np.exp(-((x_cm - center_x[:, None])**2) / 15)
 
 class SoleSimulation:
-    def __init__(self, length_cm=28, width_cm=10, resolution=1.0):
+    def __init__(self, length_cm=28, width_cm=10, resolution=1.0, dtype=np.float64):
+        # dtype=np.float32 halves map memory for high-resolution grids (e.g. resolution=0.05);
+        # equilibrium sums are always accumulated in float64.
         self.dx = resolution
+        self.dtype = np.dtype(dtype)
         self.nx = int(length_cm / self.dx)
         self.ny = int(width_cm / self.dx)
-        self.X, self.Y = np.meshgrid(np.arange(0, self.nx), np.arange(0, self.ny))
+        # 1-D cell-centre coordinates in cm; full grids are only built by broadcasting
+        self.x = np.arange(self.nx) * self.dx
+        self.y = np.arange(self.ny) * self.dx
         
-        self.thickness_map = np.zeros((self.ny, self.nx))
-        self.stiffness_map = np.zeros((self.ny, self.nx))
-        self.pressure_map = np.zeros((self.ny, self.nx))
-        self.wear_map = np.zeros((self.ny, self.nx)) 
+        self.thickness_map = np.zeros((self.ny, self.nx), dtype=self.dtype)
+        self.stiffness_map = np.zeros((self.ny, self.nx), dtype=self.dtype)
+        self.pressure_map = np.zeros((self.ny, self.nx), dtype=self.dtype)
+        self.wear_map = np.zeros((self.ny, self.nx), dtype=self.dtype)
         self.current_wear_factor = 0.01
+        self.solve_info = {}
+        self._static_weight = None
+        self._groove_masks = {}
+        self.gait_type = "Neutral"
         self.foot_shape = self._generate_foot_shape("Neutral")
+        self._prepare_contact()
 
     def _generate_foot_shape(self, gait_type="Neutral"):
-        heel = np.exp(-((self.X - 5)**2 + (self.Y - self.ny/2)**2) / 20)
-        ball = np.exp(-((self.X - 20)**2 + (self.Y - self.ny/2)**2) / 30)
-        toes = 0.6 * np.exp(-((self.X - 25)**2 + (self.Y - self.ny/2)**2) / 15)
+        X, Y = self.x[None, :], self.y[:, None]
+        W = self.ny * self.dx
+        heel = np.exp(-((X - 5)**2 + (Y - W/2)**2) / 20)
+        ball = np.exp(-((X - 20)**2 + (Y - W/2)**2) / 30)
+        toes = 0.6 * np.exp(-((X - 25)**2 + (Y - W/2)**2) / 15)
         
         if gait_type == "Overpronator (Flat Foot)":
-            arch_cut = -0.1 * np.exp(-((self.X - 12)**2 + (self.Y - self.ny/1.5)**2) / 20)
-            bias = 0.25 * np.exp(-((self.Y - self.ny/3)**2) / 40)
+            arch_cut = -0.1 * np.exp(-((X - 12)**2 + (Y - W/1.5)**2) / 20)
+            bias = 0.25 * np.exp(-((Y - W/3)**2) / 40)
         elif gait_type == "Supinator (High Arch)":
-            arch_cut = -0.9 * np.exp(-((self.X - 12)**2 + (self.Y - self.ny/1.5)**2) / 15)
-            bias = 0.25 * np.exp(-((self.Y - self.ny*0.8)**2) / 40)
+            arch_cut = -0.9 * np.exp(-((X - 12)**2 + (Y - W/1.5)**2) / 15)
+            bias = 0.25 * np.exp(-((Y - W*0.8)**2) / 40)
         else:
-            arch_cut = -0.5 * np.exp(-((self.X - 12)**2 + (self.Y - self.ny/1.5)**2) / 20)
+            arch_cut = -0.5 * np.exp(-((X - 12)**2 + (Y - W/1.5)**2) / 20)
             bias = 0
             
         shape = (heel + ball + toes + arch_cut + bias)
-        return np.clip(shape, 0, 1)
+        return np.clip(shape, 0, 1).astype(self.dtype)
 
     def update_gait(self, gait_type):
+        self.gait_type = gait_type
         self.foot_shape = self._generate_foot_shape(gait_type)
+        self._prepare_contact()
+        self._static_weight = None
+
+    def _prepare_contact(self):
+        # Each contact cell engages once penetration passes its breakpoint
+        # b = 10 - 10 * foot_shape, so cells are sorted by breakpoint once per gait.
+        # Only these flat indices take part in solves.
+        idx = np.flatnonzero(self.foot_shape > 0.1)
+        breakpoints = 10 - self.foot_shape.ravel()[idx].astype(float) * 10
+        order = np.argsort(breakpoints, kind="stable")
+        self._contact_idx = idx[order]
+        self._contact_col = self._contact_idx % self.nx
+        self._breakpoints = breakpoints[order]
+
+    def _groove_mask(self, groove_type):
+        # Grooves are laid out on a 1 cm pitch so patterns don't change with resolution
+        if groove_type not in self._groove_masks:
+            xi = np.floor(np.round(self.x, 6)).astype(int)[None, :]
+            yi = np.floor(np.round(self.y, 6)).astype(int)[:, None]
+            if groove_type == "Horizontal Sipes": cut, depth = (xi % 3 == 0), 0.2
+            elif groove_type == "Grid Pattern": cut, depth = (xi % 4 == 0) | (yi % 4 == 0), 0.2
+            elif groove_type == "Honeycomb": cut, depth = ((xi + yi) % 5 == 0), 0.1
+            else: cut, depth = np.zeros((1, 1), dtype=bool), 1.0
+            mask = np.where(cut, depth, 1.0)
+            self._groove_masks[groove_type] = np.broadcast_to(mask, (self.ny, self.nx)).astype(self.dtype)
+        return self._groove_masks[groove_type]
+
+    def _stiffness_rows(self, heel_mm, fore_mm, arch_stiff, modulus):
+        # Stiffness before the tread mask only varies along the length: (..., nx) rows
+        heel_mm, fore_mm, arch_stiff, modulus = np.broadcast_arrays(
+            *(np.asarray(v, dtype=float) for v in (heel_mm, fore_mm, arch_stiff, modulus)))
+        gradient = np.linspace(heel_mm, fore_mm, self.nx, axis=-1)
+        rows = modulus[..., None] / (gradient + 1e-5)
 
-    def update_design(self, heel_mm, fore_mm, arch_stiff, modulus, groove_type="None", wear_factor=0.01):
-        self.current_wear_factor = wear_factor
-        gradient = np.linspace(heel_mm, fore_mm, self.nx)
-        self.thickness_map[:] = gradient
-        self.stiffness_map = modulus / (self.thickness_map + 1e-5)
-        
         mid_x = int(self.nx * 0.4)
         mid_range = int(self.nx * 0.15)
-        self.stiffness_map[:, mid_x-mid_range : mid_x+mid_range] *= arch_stiff
-        
-        mask = np.ones_like(self.stiffness_map)
-        if groove_type == "Horizontal Sipes": mask[:, ::3] = 0.2
-        elif groove_type == "Grid Pattern": mask[:, ::4] = 0.2; mask[::4, :] = 0.2
-        elif groove_type == "Honeycomb": mask[(self.X + self.Y) % 5 == 0] = 0.1
-        self.stiffness_map *= mask
+        rows[..., mid_x-mid_range : mid_x+mid_range] *= arch_stiff[..., None]
+        return gradient, rows
+
+    def update_design(self, heel_mm, fore_mm, arch_stiff, modulus, groove_type="None", wear_factor=0.01):
+        self.current_wear_factor = wear_factor
+        self._static_weight = None
+        gradient, rows = self._stiffness_rows(heel_mm, fore_mm, arch_stiff, modulus)
+        # Thickness is constant across the width, so keep it as a read-only broadcast view
+        self.thickness_map = np.broadcast_to(gradient.astype(self.dtype), (self.ny, self.nx))
+        self.stiffness_map = (rows * self._groove_mask(groove_type)).astype(self.dtype, copy=False)
 
-    def solve_static(self, weight_kg):
+    def update_thickness(self, thickness_map):
+        # Keeps each cell's modulus/arch/groove factor, e.g. for a sole thinned by wear
+        stiffness_factor = self.stiffness_map * (self.thickness_map + 1e-5)
+        self.thickness_map = thickness_map
+        self.stiffness_map = stiffness_factor / (thickness_map + 1e-5)
+        self._static_weight = None
+
+    def _equilibrium(self, k_sorted, target_force, max_penetration=50.0):
+        # Total force F(p) = dx^2 * sum(k * max(p - b, 0)) is monotone and piecewise
+        # linear in p, so the exact root lies on the segment where F first
+        # crosses the target. Works on (..., n_contact) stacks of stiffness.
+        b = self._breakpoints
+        area = self.dx ** 2
+        k_cum = np.cumsum(k_sorted, axis=-1, dtype=float)
+        kb_cum = np.cumsum(k_sorted * b, axis=-1, dtype=float)
+        force_at_b = (b * k_cum - kb_cum) * area
+        target = np.asarray(target_force, dtype=float)[..., None]
+
+        n_active = np.maximum(np.sum(force_at_b < target, axis=-1), 1)
+        k_active = np.take_along_axis(k_cum, n_active[..., None] - 1, axis=-1)[..., 0]
+        kb_active = np.take_along_axis(kb_cum, n_active[..., None] - 1, axis=-1)[..., 0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            penetration = (target[..., 0] / area + kb_active) / k_active
+        unloaded = target[..., 0] <= 0
+        reachable = unloaded | ((k_active > 0) & (penetration <= max_penetration))
+        penetration = np.where(unloaded, b[0], np.where(reachable, penetration, max_penetration))
+        penetration = np.maximum(penetration, b[0])
+        return penetration, reachable
+
+    @profiling.traced("physics.solve_static")
+    def solve_static(self, weight_kg, tol=1e-6, max_penetration=50.0):
         target_force = weight_kg * 9.81
-        penetration = 0
-        foot_mask = self.foot_shape > 0.1
-        for _ in range(500):
-            local_compression = np.maximum((self.foot_shape * 10) - (10 - penetration), 0)
-            reaction_pressure = self.stiffness_map * local_compression * foot_mask
-            current_force = np.sum(reaction_pressure) * (self.dx**2)
-            if current_force >= target_force:
-                self.pressure_map = reaction_pressure
-                break
-            penetration += 0.1
+        self.pressure_map = np.zeros((self.ny, self.nx), dtype=self.dtype)
+        if self._contact_idx.size == 0:
+            self.solve_info = {"converged": False, "penetration": 0.0, "force_N": 0.0,
+                               "target_N": target_force, "iterations": 0}
+            return self.pressure_map
+
+        k = self.stiffness_map.ravel()[self._contact_idx]
+        penetration, reachable = self._equilibrium(k, target_force, max_penetration)
+        penetration = float(penetration)
+        contact_pressure = k * np.maximum(penetration - self._breakpoints, 0)
+        self.pressure_map.ravel()[self._contact_idx] = contact_pressure
+
+        current_force = float(np.sum(contact_pressure)) * (self.dx**2)
+        residual = abs(current_force - target_force)
+        converged = bool(reachable) and residual <= tol * max(target_force, 1.0)
+        self.solve_info = {
+            "converged": converged,
+            "penetration": penetration,
+            "force_N": current_force,
+            "target_N": target_force,
+            "iterations": 1,
+        }
+        profiling.count("physics.solver_iterations", self.solve_info["iterations"])
+        self._static_weight = weight_kg
         return self.pressure_map
 
-    def solve_walking_step(self, weight_kg, gait_phase_pct):
-        center_x = 5 + (gait_phase_pct * 20)
-        focus_blob = np.exp(-((self.X - center_x)**2) / 15)
-        base_pressure = self.solve_static(weight_kg)
-        dynamic_pressure = base_pressure * focus_blob
-        
+    def contact_cells(self):
+        # Flat index, engagement breakpoint, stiffness and x (cm) of every contact
+        # cell, sorted by breakpoint
+        idx = self._contact_idx
+        return idx, self._breakpoints, self.stiffness_map.ravel()[idx].astype(float), self.x[self._contact_col]
+
+    def static_pressure(self, weight_kg):
+        # Reuses the last equilibrium until the design, gait or weight changes
+        if self._static_weight != weight_kg:
+            profiling.count("cache.static_pressure.miss")
+            self.solve_static(weight_kg)
+        else:
+            profiling.count("cache.static_pressure.hit")
+        return self.pressure_map
+
+    def batch_chunk_size(self, cell_budget=BATCH_CELL_BUDGET):
+        # Designs per batch chunk, so memory follows grid size rather than design count
+        return max(1, cell_budget // (self.nx * self.ny))
+
+    @profiling.traced("physics.solve_static_batch")
+    def solve_static_batch(self, heel_mm, fore_mm, arch_stiff, modulus, weight_kg,
+                           groove_type="None", chunk_size=None, return_maps=False):
+        chunk_size = self.batch_chunk_size() if chunk_size is None else chunk_size
+        heel_mm, fore_mm, arch_stiff, modulus, weight_kg = (
+            np.atleast_1d(np.asarray(v, dtype=float)) for v in (heel_mm, fore_mm, arch_stiff, modulus, weight_kg))
+        n = max(len(heel_mm), len(fore_mm), len(arch_stiff), len(modulus), len(weight_kg))
+        heel_mm, fore_mm, arch_stiff, modulus, weight_kg = (
+            np.broadcast_to(v, (n,)) for v in (heel_mm, fore_mm, arch_stiff, modulus, weight_kg))
+
+        # Tread patterns are shared by many designs, so gather each mask's contact cells once.
+        grooves = np.broadcast_to(np.asarray(groove_type, dtype=object), (n,))
+        groove_names, groove_index = np.unique(grooves.astype(str), return_inverse=True)
+        groove_contact = np.stack([self._groove_mask(g).ravel()[self._contact_idx] for g in groove_names])
+
+        peak = np.zeros(n)
+        penetration = np.zeros(n)
+        converged = np.zeros(n, dtype=bool)
+        contact_area = np.zeros(n)
+        maps = np.zeros((n, self.ny, self.nx), dtype=self.dtype) if return_maps else None
+
+        b = self._breakpoints
+        profiling.count("physics.batch_designs", n)
+        for lo in range(0, n if b.size else 0, chunk_size):
+            sl = slice(lo, min(lo + chunk_size, n))
+            # (designs, contact cells) stiffness straight from the per-column rows
+            _, rows = self._stiffness_rows(heel_mm[sl], fore_mm[sl], arch_stiff[sl], modulus[sl])
+            k = (np.take(rows, self._contact_col, axis=1) * groove_contact[groove_index[sl]]).astype(self.dtype, copy=False)
+            pen, reachable = self._equilibrium(k, weight_kg[sl] * 9.81)
+            contact_pressure = k * np.maximum(pen[:, None] - b, 0)
+
+            peak[sl] = contact_pressure.max(axis=1)
+            penetration[sl] = pen
+            converged[sl] = reachable
+            contact_area[sl] = np.count_nonzero(contact_pressure > 0, axis=1) * (self.dx**2)
+            if return_maps:
+                maps[sl].reshape(-1, self.ny * self.nx)[:, self._contact_idx] = contact_pressure
+
+        results = {
+            "peak_pressure": peak,
+            "comfort_score": comfort_score(peak),
+            "contact_area_cm2": contact_area,
+            "penetration": penetration,
+            "converged": converged,
+        }
+        if return_maps:
+            results["pressure_maps"] = maps
+        return results
+
+    def _walk_scaling(self, base_pressure, weight_kg, phases):
+        # The focus blob only varies along the length, so each phase is a row scaling.
+        # base_pressure may be one (ny, nx) map or an (N, ny, nx) stack.
+        focus_blob = gait_focus(self.x, phases)
+
         dynamic_factor = 1.2
-        current_sum = np.sum(dynamic_pressure)
-        applied_load_N = 0
-        if current_sum > 0:
-            target = weight_kg * 9.81 * dynamic_factor
-            dynamic_pressure *= (target / (current_sum * (self.dx**2)))
-            applied_load_N = target
-        
-        self.wear_map += dynamic_pressure * self.current_wear_factor
-        return dynamic_pressure, applied_load_N
\ No newline at end of file
+        current_sum = base_pressure.sum(axis=-2) @ focus_blob.T
+        target = np.asarray(weight_kg, dtype=float)[..., None] * 9.81 * dynamic_factor
+        target = np.broadcast_to(target, current_sum.shape)
+        loaded = current_sum > 0
+        scale = np.zeros_like(current_sum)
+        scale[loaded] = target[loaded] / (current_sum[loaded] * (self.dx**2))
+        applied_loads = np.where(loaded, target, 0.0)
+        return focus_blob, scale, applied_loads
+
+    @profiling.traced("physics.walk_cycle")
+    def solve_walk_cycle(self, weight_kg, phases):
+        phases = np.atleast_1d(np.asarray(phases, dtype=float))
+        base_pressure = self.static_pressure(weight_kg)
+        focus_blob, scale, applied_loads = self._walk_scaling(base_pressure, weight_kg, phases)
+        frames = base_pressure[None, :, :] * (focus_blob * scale[:, None])[:, None, :]
+
+        self.wear_map += frames.sum(axis=0) * self.current_wear_factor
+        peaks = frames.reshape(len(phases), -1).max(axis=1)
+        return frames, peaks, applied_loads
+
+    @profiling.traced("physics.walk_cycle_batch")
+    def walk_cycle_batch(self, pressure_maps, weight_kg, phases, wear_factor=0.01):
+        # Walk summaries for an (N, ny, nx) stack of static maps without
+        # materialising the (N, phases, ny, nx) frames: per-phase peaks and loads,
+        # plus the wear one full cycle deposits.
+        phases = np.atleast_1d(np.asarray(phases, dtype=float))
+        weight_kg = np.broadcast_to(np.asarray(weight_kg, dtype=float), pressure_maps.shape[:1])
+        focus_blob, scale, applied_loads = self._walk_scaling(pressure_maps, weight_kg, phases)
+        col_peak = pressure_maps.max(axis=-2)
+        peaks = (col_peak[:, None, :] * focus_blob[None, :, :]).max(axis=-1) * scale
+        cycle_weight = scale @ focus_blob
+        wear_factor = np.broadcast_to(np.asarray(wear_factor, dtype=float), pressure_maps.shape[:1])
+        wear = pressure_maps * (cycle_weight * wear_factor[:, None])[:, None, :]
+        return peaks, applied_loads, wear
+
+    def solve_walking_step(self, weight_kg, gait_phase_pct):
+        frames, _, applied_loads = self.solve_walk_cycle(weight_kg, gait_phase_pct)
+        return frames[0], float(applied_loads[0])
@@ -0,0 +1,110 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+# Spans and counters for the solve/render/train hot paths. Library code calls the
+# module-level span()/count()/traced(); they report to the profiler activated for the
+# current context (one per dashboard session) and cost one ContextVar lookup when
+# nothing is active or profiling is switched off.
+
+_active = contextvars.ContextVar("solesim_profiler", default=None)
+_NULL_SPAN = nullcontext()
+
+class Profiler:
+    def __init__(self, capacity=5000, enabled=False):
+        self.enabled = enabled
+        self.events = deque(maxlen=capacity)  # (name, start_ns, dur_ns, thread id, args)
+        self.counters = {}
+        self._origin_ns = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def span(self, name, **args):
+        return _Span(self, name, args) if self.enabled else _NULL_SPAN
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self, name, start_ns, dur_ns, args=None):
+        self.events.append((name, start_ns - self._origin_ns, dur_ns, threading.get_ident(), args or {}))
+
+    def reset(self):
+        with self._lock:
+            self.events.clear()
+            self.counters.clear()
+
+    def summary(self):
+        durations = {}
+        for name, _, dur, _, _ in list(self.events):
+            durations.setdefault(name, []).append(dur / 1e6)
+        rows = []
+        for name, d in durations.items():
+            d.sort()
+            rows.append({"span": name, "calls": len(d), "total_ms": sum(d), "mean_ms": sum(d) / len(d),
+                         "p95_ms": d[min(int(0.95 * len(d)), len(d) - 1)], "max_ms": d[-1]})
+        return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+    def to_json(self):
+        spans = [{"name": name, "start_ms": start / 1e6, "dur_ms": dur / 1e6, "thread": tid, "args": args}
+                 for name, start, dur, tid, args in list(self.events)]
+        return json.dumps({"spans": spans, "counters": dict(self.counters), "summary": self.summary()}, indent=2)
+
+    def to_chrome_trace(self):
+        # Trace Event Format (chrome://tracing, Perfetto): complete events, microsecond timestamps
+        pid = os.getpid()
+        events = [{"name": name, "cat": name.split(".")[0], "ph": "X", "ts": start / 1e3, "dur": dur / 1e3,
+                   "pid": pid, "tid": tid, "args": args}
+                  for name, start, dur, tid, args in list(self.events)]
+        end_us = (time.perf_counter_ns() - self._origin_ns) / 1e3
+        events += [{"name": name, "ph": "C", "ts": end_us, "pid": pid, "args": {"value": value}}
+                   for name, value in self.counters.items()]
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"})
+
+class _Span:
+    __slots__ = ("profiler", "name", "args", "start")
+
+    def __init__(self, profiler, name, args):
+        self.profiler, self.name, self.args = profiler, name, args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns() - self.start, self.args)
+        return False
+
+def activate(profiler):
+    _active.set(profiler)
+
+def current():
+    return _active.get()
+
+def span(name, **args):
+    profiler = _active.get()
+    if profiler is None or not profiler.enabled:
+        return _NULL_SPAN
+    return _Span(profiler, name, args)
+
+def count(name, n=1):
+    profiler = _active.get()
+    if profiler is not None:
+        profiler.count(name, n)
+
+def traced(name):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler = _active.get()
+            if profiler is None or not profiler.enabled:
+                return fn(*args, **kwargs)
+            with _Span(profiler, name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
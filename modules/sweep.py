@@ -0,0 +1,110 @@
+import numpy as np
+from modules import profiling
+from modules.physics import GROOVE_TYPES
+from modules.wear import wear_through_km_batch
+
+MATERIALS = {
+    "EVA Foam (Budget)":   {"mod": 25, "rho": 0.25, "wear": 0.020, "cost": 0.40},
+    "PU Foam (Standard)":  {"mod": 55, "rho": 0.45, "wear": 0.010, "cost": 0.90},
+    "Rubber (Heavy Duty)": {"mod": 90, "rho": 1.10, "wear": 0.005, "cost": 0.70},
+    "TPU (Premium)":       {"mod": 70, "rho": 1.20, "wear": 0.008, "cost": 2.10},
+    "Custom / AI Mode":    {"mod": 30, "rho": 0.30, "wear": 0.015, "cost": 0.50}
+}
+
+# Objectives as (column, sense): +1 maximise, -1 minimise. const_rate_life_km is the
+# Archard wear-through distance at the new sole's wear rate; the dashboard's forecast
+# also re-solves the thinning sole every 25 km, so it reads a few percent lower.
+PARETO_OBJECTIVES = [("comfort", 1), ("mass_g", -1), ("cost_inr", -1), ("const_rate_life_km", 1), ("carbon_kg", -1)]
+
+def design_metrics(heel_mm, fore_mm, density, unit_cost):
+    avg_thickness_mm = (np.asarray(heel_mm) + np.asarray(fore_mm)) / 2
+    est_volume_cm3 = (avg_thickness_mm / 10) * 250
+    mass_g = est_volume_cm3 * density
+    return {
+        "mass_g": mass_g,
+        "cost_inr": mass_g * unit_cost * 1.5,
+        "carbon_kg": (mass_g * 0.02) / 1000,
+    }
+
+def random_geometries(n_samples, seed=None):
+    rng = np.random.default_rng(seed)
+    return (rng.uniform(5, 50, n_samples).astype(int),
+            rng.uniform(5, 50, n_samples).astype(int),
+            np.round(rng.uniform(0.5, 5.0, n_samples), 1))
+
+def grid_geometries(steps=10):
+    heel, fore, arch = np.meshgrid(np.linspace(5, 50, steps).astype(int),
+                                   np.linspace(5, 50, steps).astype(int),
+                                   np.round(np.linspace(0.5, 5.0, steps), 1), indexing="ij")
+    return heel.ravel(), fore.ravel(), arch.ravel()
+
+@profiling.traced("physics.design_sweep")
+def run_design_sweep(sim, weight_kg, geometries, materials=None, grooves=None, chunk_size=None):
+    # Every geometry x material x tread combination, batch-solved in chunks so the
+    # pressure maps needed for the wear rate never all live at once
+    chunk_size = sim.batch_chunk_size() if chunk_size is None else chunk_size
+    materials = MATERIALS if materials is None else materials
+    grooves = GROOVE_TYPES if grooves is None else grooves
+    heel, fore, arch = (np.asarray(g) for g in geometries)
+    names = list(materials)
+    n_geo, n_mat, n_groove = len(heel), len(names), len(grooves)
+
+    geo_idx, mat_idx, groove_idx = (a.ravel() for a in np.meshgrid(
+        np.arange(n_geo), np.arange(n_mat), np.arange(n_groove), indexing="ij"))
+    props = {k: np.array([materials[m][k] for m in names], dtype=float)[mat_idx]
+             for k in ("mod", "rho", "wear", "cost")}
+
+    groove_names = np.asarray(grooves, dtype=object)[groove_idx]
+    peak, comfort, life = (np.zeros(len(geo_idx)) for _ in range(3))
+    for lo in range(0, len(geo_idx), chunk_size):
+        sl = slice(lo, lo + chunk_size)
+        g = geo_idx[sl]
+        res = sim.solve_static_batch(heel[g], fore[g], arch[g], props["mod"][sl], weight_kg, groove_names[sl],
+                                     return_maps=True)
+        peak[sl], comfort[sl] = res["peak_pressure"], res["comfort_score"]
+        life[sl] = wear_through_km_batch(sim, res["pressure_maps"], weight_kg, props["wear"][sl])
+    sweep = {
+        "heel_mm": heel[geo_idx],
+        "fore_mm": fore[geo_idx],
+        "arch": arch[geo_idx],
+        "material": np.asarray(names, dtype=object)[mat_idx],
+        "groove": groove_names,
+        "peak_pressure": peak,
+        "comfort": comfort,
+        "const_rate_life_km": life,
+    }
+    sweep.update(design_metrics(sweep["heel_mm"], sweep["fore_mm"], props["rho"], props["cost"]))
+    sweep["pareto"] = pareto_mask(np.column_stack([-sense * sweep[col] for col, sense in PARETO_OBJECTIVES]))
+    return sweep
+
+@profiling.traced("sweep.pareto_mask")
+def pareto_mask(costs, chunk_size=1024):
+    # Non-dominated rows of a minimisation problem. Duplicates are collapsed and the
+    # unique points visited in lexicographic order, so nothing later can dominate an
+    # accepted point and each chunk is only checked against the current front.
+    # With unique rows, "a dominates b" reduces to all(a <= b).
+    costs = np.asarray(costs, dtype=float)
+    if len(costs) == 0:
+        return np.zeros(0, dtype=bool)
+    uniq, inverse = np.unique(costs, axis=0, return_inverse=True)
+    order = np.lexsort(uniq.T[::-1])
+    front = np.empty((0, costs.shape[1]))
+    keep = np.zeros(len(uniq), dtype=bool)
+
+    for lo in range(0, len(order), chunk_size):
+        idx = order[lo:lo + chunk_size]
+        cand = uniq[idx]
+        if len(front):
+            dominated = np.zeros(len(cand), dtype=bool)
+            for flo in range(0, len(front), chunk_size):
+                f = front[flo:flo + chunk_size][:, None, :]
+                dominated |= np.any(np.all(f <= cand[None], axis=2), axis=0)
+            idx, cand = idx[~dominated], cand[~dominated]
+        # Within the chunk, only earlier (lexicographically smaller) points can dominate
+        inner = np.all(cand[:, None] <= cand[None], axis=2)
+        np.fill_diagonal(inner, False)
+        survivors = ~np.any(inner, axis=0)
+        keep[idx[survivors]] = True
+        front = np.vstack([front, cand[survivors]])
+
+    return keep[inverse.ravel()]
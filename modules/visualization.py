@@ -1,12 +1,14 @@
-import matplotlib
-matplotlib.use('Agg') 
-import matplotlib.pyplot as plt
-from matplotlib.colors import LinearSegmentedColormap
-import plotly.graph_objects as go
+import io
+from functools import lru_cache
 import numpy as np
+from modules import profiling
 
-# --- GLOBAL PLOT STYLING FOR DARK THEME ---
-plt.rcParams.update({
+# matplotlib and plotly are imported on first use, so the RGB animation path and
+# headless callers never load them. The dark theme is scoped to each figure
+# instead of being written into the global rcParams.
+
+# --- PLOT STYLING FOR DARK THEME ---
+DARK_STYLE = {
     "figure.facecolor": "#0E1117",
     "axes.facecolor": "#0E1117",
     "axes.edgecolor": "#303030",
@@ -16,49 +18,150 @@ plt.rcParams.update({
     "ytick.color": "white",
     "grid.color": "#303030",
     "figure.autolayout": True
-})
+}
+
+# Blue -> Cyan -> Yellow -> Red, evenly spaced
+CMAP_COLORS = [(0, 0, 0.5), (0, 1, 1), (1, 1, 0), (1, 0, 0)]
+
+@lru_cache(maxsize=1)
+def _pyplot():
+    import matplotlib
+    matplotlib.use('Agg')  # Prevents threading errors in Streamlit
+    import matplotlib.pyplot as plt
+    return plt
 
 def get_custom_cmap():
-    # Blue -> Cyan -> Yellow -> Red
-    return LinearSegmentedColormap.from_list("p", [(0,0,0.5), (0,1,1), (1,1,0), (1,0,0)])
+    from matplotlib.colors import LinearSegmentedColormap
+    return LinearSegmentedColormap.from_list("p", CMAP_COLORS)
+
+# --- FAST RGB PATH (LIVE ANIMATION) ---
+@lru_cache(maxsize=4)
+def get_cmap_lut(n_colors=256, cmap_size=256):
+    # Same colours as get_custom_cmap(..., bytes=True), i.e. what imshow draws:
+    # cmap_size-entry table, floor binning, truncated to bytes. NumPy alone.
+    nodes = np.linspace(0, 1, len(CMAP_COLORS)) * (cmap_size - 1)
+    colors = np.array(CMAP_COLORS, dtype=float)
+    x = np.linspace(0, 1, cmap_size) * (cmap_size - 1)
+    seg = np.searchsorted(nodes, x)[1:-1]
+    distance = ((x[1:-1] - nodes[seg - 1]) / (nodes[seg] - nodes[seg - 1]))[:, None]
+    table = np.vstack([colors[:1], distance * (colors[seg] - colors[seg - 1]) + colors[seg - 1], colors[-1:]])
+    idx = np.minimum((np.linspace(0, 1, n_colors) * cmap_size).astype(int), cmap_size - 1)
+    return (table[idx] * 255).astype(np.uint8)
+
+@profiling.traced("render.rgb_frame")
+def pressure_to_rgb(pressure_map, max_scale, upscale=8):
+    # Same binning as imshow(vmin=0, vmax=max_scale), without a figure
+    lut = get_cmap_lut()
+    n = len(lut)
+    idx = np.clip(pressure_map * (n / max(max_scale, 1e-9)), 0, n - 1).astype(np.intp)
+    rgb = lut[idx]
+    if upscale > 1:
+        rgb = rgb.repeat(upscale, axis=0).repeat(upscale, axis=1)
+    return rgb
+
+class LivePeakChart:
+    # Peak-vs-phase trace drawn straight into a uint8 buffer, one segment per frame
+    def __init__(self, max_limit, width=600, height=200, color=(0, 255, 255), bg=(14, 17, 23)):
+        self.max_limit = max(max_limit, 1e-9)
+        self.width, self.height = width, height
+        self.color = np.array(color, dtype=np.uint8)
+        self.fill = np.round(0.1 * np.array(color) + 0.9 * np.array(bg)).astype(np.uint8)
+        self.canvas = np.empty((height, width, 3), dtype=np.uint8)
+        self.canvas[:] = bg
+        self.canvas[np.linspace(0, height - 1, 5).astype(int)[1:-1], ::6] = (48, 48, 48)
+        self._last = None
+
+    def _to_px(self, phase_pct, value):
+        x = int(round(np.clip(phase_pct / 100, 0, 1) * (self.width - 1)))
+        y = int(round((1 - np.clip(value / self.max_limit, 0, 1)) * (self.height - 1)))
+        return x, y
+
+    @profiling.traced("render.live_chart")
+    def add_point(self, phase_pct, value):
+        x1, y1 = self._to_px(phase_pct, value)
+        x0, y0 = self._last if self._last is not None else (x1, y1)
+        self._last = (x1, y1)
+
+        n = max(abs(x1 - x0), abs(y1 - y0)) + 1
+        xs = np.round(np.linspace(x0, x1, n)).astype(int)
+        ys = np.round(np.linspace(y0, y1, n)).astype(int)
+
+        # Fill under the new segment, then stroke it 2px thick
+        cols = np.arange(x0, x1 + 1)
+        col_y = np.interp(cols, [x0, x1], [y0, y1]) if x1 > x0 else np.full(len(cols), y1)
+        below = np.arange(self.height)[:, None] > col_y[None, :]
+        segment = self.canvas[:, x0:x1 + 1]
+        segment[below] = self.fill
+        self.canvas[ys, xs] = self.color
+        self.canvas[np.minimum(ys + 1, self.height - 1), xs] = self.color
+        return self.canvas
+
+@profiling.traced("render.png")
+def figure_to_png(fig, dpi=200):
+    # Rasterize once (same defaults as st.pyplot) so the bytes can be cached and the figure freed
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=dpi, bbox_inches="tight")
+    _pyplot().close(fig)
+    return buf.getvalue()
 
+@profiling.traced("render.static_heatmap")
 def plot_static_heatmap(pressure_map, peak_val):
-    fig, ax = plt.subplots(figsize=(6, 3))
-    im = ax.imshow(pressure_map, cmap=get_custom_cmap(), aspect='auto')
-    cbar = plt.colorbar(im, label="Pressure (N/cm²)")
-    cbar.ax.yaxis.set_tick_params(color='white')
-    cbar.outline.set_edgecolor('#303030')
-    plt.setp(plt.getp(cbar.ax.axes, 'yticklabels'), color='white')
-    
-    ax.set_title(f"Peak Pressure: {peak_val:.2f} N/cm²", color="#00FFFF", fontweight='bold')
-    ax.axis('off')
+    plt = _pyplot()
+    with plt.rc_context(DARK_STYLE):
+        fig, ax = plt.subplots(figsize=(6, 3))
+        im = ax.imshow(pressure_map, cmap=get_custom_cmap(), aspect='auto')
+        cbar = plt.colorbar(im, label="Pressure (N/cm²)")
+        cbar.ax.yaxis.set_tick_params(color='white')
+        cbar.outline.set_edgecolor('#303030')
+        plt.setp(plt.getp(cbar.ax.axes, 'yticklabels'), color='white')
+        
+        ax.set_title(f"Peak Pressure: {peak_val:.2f} N/cm²", color="#00FFFF", fontweight='bold')
+        ax.axis('off')
     return fig
 
+@profiling.traced("render.dynamic_heatmap")
 def plot_dynamic_heatmap(pressure_map, max_scale):
-    fig, ax = plt.subplots(figsize=(6, 2.5))
-    ax.imshow(pressure_map, cmap=get_custom_cmap(), vmin=0, vmax=max_scale, aspect='auto')
-    ax.set_title(f"Dynamic Pressure Distribution", color="#00FFFF")
-    ax.axis('off')
+    plt = _pyplot()
+    with plt.rc_context(DARK_STYLE):
+        fig, ax = plt.subplots(figsize=(6, 2.5))
+        ax.imshow(pressure_map, cmap=get_custom_cmap(), vmin=0, vmax=max_scale, aspect='auto')
+        ax.set_title(f"Dynamic Pressure Distribution", color="#00FFFF")
+        ax.axis('off')
     return fig
 
+@profiling.traced("render.live_chart_figure")
 def plot_live_chart(peak_history, phase, max_limit):
-    fig, ax = plt.subplots(figsize=(6, 2))
-    
-    # --- ERROR FIX: REMOVED 'shadow=True' argument ---
-    ax.plot(np.linspace(0, phase*100, len(peak_history)), peak_history, color='#00FFFF', linewidth=2)
-    
-    ax.set_xlim(0, 100)
-    ax.set_ylim(0, max_limit)
-    ax.set_xlabel("Gait Cycle (%)")
-    ax.set_ylabel("Peak N/cm²")
-    ax.grid(True, linestyle='--', alpha=0.3)
-    
-    # Fill under line for "Cyber" look
-    ax.fill_between(np.linspace(0, phase*100, len(peak_history)), peak_history, color='#00FFFF', alpha=0.1)
+    plt = _pyplot()
+    with plt.rc_context(DARK_STYLE):
+        fig, ax = plt.subplots(figsize=(6, 2))
+        
+        # --- ERROR FIX: REMOVED 'shadow=True' argument ---
+        ax.plot(np.linspace(0, phase*100, len(peak_history)), peak_history, color='#00FFFF', linewidth=2)
+        
+        ax.set_xlim(0, 100)
+        ax.set_ylim(0, max_limit)
+        ax.set_xlabel("Gait Cycle (%)")
+        ax.set_ylabel("Peak N/cm²")
+        ax.grid(True, linestyle='--', alpha=0.3)
+        
+        # Fill under line for "Cyber" look
+        ax.fill_between(np.linspace(0, phase*100, len(peak_history)), peak_history, color='#00FFFF', alpha=0.1)
     
     return fig
 
+@profiling.traced("render.wear_map")
+def plot_wear_map(wear_map):
+    plt = _pyplot()
+    with plt.rc_context(DARK_STYLE):
+        fig, ax = plt.subplots(figsize=(6, 2))
+        ax.imshow(wear_map, cmap='inferno', aspect='auto')
+        ax.axis('off')
+        ax.set_title("PREDICTED WEAR ZONES", color="white")
+    return fig
+
+@profiling.traced("render.topology_3d")
 def create_3d_topology(pressure_map):
+    import plotly.graph_objects as go
     fig_3d = go.Figure(data=[go.Surface(z=pressure_map, colorscale='Viridis')])
     fig_3d.update_layout(
         title='',
@@ -72,4 +175,36 @@ def create_3d_topology(pressure_map):
         margin=dict(l=0, r=0, b=0, t=0), 
         height=300
     )
-    return fig_3d
\ No newline at end of file
+    return fig_3d
+
+@profiling.traced("render.pareto")
+def create_pareto_plot(sweep, x="cost_inr", y="comfort", max_background=5000):
+    front = np.flatnonzero(sweep["pareto"])
+    rest = np.flatnonzero(~sweep["pareto"])
+    if len(rest) > max_background:
+        rest = np.random.default_rng(0).choice(rest, max_background, replace=False)
+
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(
+        x=sweep[x][rest], y=sweep[y][rest], mode="markers", name="Dominated",
+        marker=dict(color="#444", size=4), hoverinfo="skip"
+    ))
+    hover = ("%{customdata[0]} | %{customdata[1]}<br>HEEL %{customdata[2]}mm  FORE %{customdata[3]}mm  ARCH %{customdata[4]}x"
+             "<br>COMFORT %{customdata[5]:.1f}  MASS %{customdata[6]:.0f}g  COST ₹%{customdata[7]:.2f}"
+             "<br>LIFE %{customdata[8]:.0f}km (CONST. RATE)  CO2e %{customdata[9]:.4f}kg<extra></extra>")
+    cols = ["material", "groove", "heel_mm", "fore_mm", "arch", "comfort", "mass_g", "cost_inr", "const_rate_life_km", "carbon_kg"]
+    for material in np.unique(sweep["material"][front]):
+        sel = front[sweep["material"][front] == material]
+        fig.add_trace(go.Scattergl(
+            x=sweep[x][sel], y=sweep[y][sel], mode="markers", name=str(material),
+            marker=dict(size=8, line=dict(color="#00FFFF", width=1)),
+            customdata=np.column_stack([sweep[c][sel] for c in cols]), hovertemplate=hover
+        ))
+    fig.update_layout(
+        xaxis=dict(title=x, color="white", gridcolor="#444"),
+        yaxis=dict(title=y, color="white", gridcolor="#444"),
+        paper_bgcolor="#0E1117", plot_bgcolor="#0E1117", font=dict(color="white"),
+        margin=dict(l=0, r=0, b=0, t=30), height=400
+    )
+    return fig
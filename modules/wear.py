@@ -0,0 +1,71 @@
+import copy
+import numpy as np
+from modules import profiling
+
+# --- ARCHARD WEAR FORECASTING ---
+# Wear depth per cycle = ARCHARD_SCALE * wear_factor * cycle-averaged pressure.
+# Calibrated so the reference PU design (25/15 mm, 75 kg, neutral gait) wears
+# WEAR_THROUGH_MM through at ~500 km, the figure the dashboard used to hard-code.
+ARCHARD_SCALE = 3.17e-5  # mm per (N/cm^2) per cycle
+STRIDE_M = 1.4           # ground covered by one full gait cycle
+WEAR_THROUGH_MM = 3.0
+MIN_THICKNESS_MM = 1.0
+
+def cycle_wear_rate(sim, weight_kg, phases=20, stride_m=STRIDE_M):
+    # Wear depth (mm) each cell loses per km, from one cycle-summed pressure stack
+    frames, _, _ = sim.solve_walk_cycle(weight_kg, np.linspace(0, 1, phases))
+    per_cycle = frames.mean(axis=0) * sim.current_wear_factor * ARCHARD_SCALE
+    return per_cycle * (1000 / stride_m)
+
+def wear_through_km_batch(sim, pressure_maps, weight_kg, wear_factor, phases=20, max_km=2000,
+                          stride_m=STRIDE_M, wear_through_mm=WEAR_THROUGH_MM):
+    # Constant-rate closed form of forecast_wear for an (N, ny, nx) stack of static maps:
+    # km until the fastest-wearing cell reaches wear_through_mm, capped at max_km
+    _, _, wear = sim.walk_cycle_batch(pressure_maps, weight_kg, np.linspace(0, 1, phases), wear_factor)
+    rate = wear.reshape(len(wear), -1).max(axis=1) / phases * ARCHARD_SCALE * (1000 / stride_m)
+    life = np.full(len(rate), float(max_km))
+    wearing = rate > 0
+    life[wearing] = np.minimum(wear_through_mm / rate[wearing], max_km)
+    return life
+
+@profiling.traced("physics.wear_forecast")
+def forecast_wear(sim, weight_kg, max_km=2000, checkpoint_km=None, phases=20,
+                  stride_m=STRIDE_M, wear_through_mm=WEAR_THROUGH_MM):
+    # Between checkpoints the wear rate is constant, so depth is integrated in
+    # closed form. With checkpoint_km set, worn depth is taken off the sole
+    # thickness at each checkpoint and the stiffness/pressure are re-solved.
+    sim = copy.deepcopy(sim)
+    sim.wear_map = np.zeros_like(sim.wear_map)
+    depth = np.zeros_like(sim.thickness_map)
+    km, wear_through_km = 0.0, None
+    history = {"km": [0.0], "max_depth_mm": [0.0], "peak_pressure": []}
+
+    while km < max_km:
+        rate = cycle_wear_rate(sim, weight_kg, phases, stride_m)
+        history["peak_pressure"].append(float(np.max(sim.pressure_map)))
+        segment = max_km - km if checkpoint_km is None else min(checkpoint_km, max_km - km)
+
+        # Distance until the first cell reaches the threshold at the current rate.
+        # Without checkpoints the rate never changes, so this is exact past the horizon.
+        wearing = rate > 0
+        if wearing.any():
+            hit = float(np.min((wear_through_mm - depth[wearing]) / rate[wearing]))
+            if checkpoint_km is None or hit <= segment:
+                wear_through_km = km + max(hit, 0.0)
+
+        depth += rate * segment
+        km += segment
+        history["km"].append(km)
+        history["max_depth_mm"].append(float(depth.max()))
+        if checkpoint_km is None or wear_through_km is not None:
+            break
+
+        sim.update_thickness(np.maximum(sim.thickness_map - rate * segment, MIN_THICKNESS_MM))
+
+    return {
+        "wear_through_km": wear_through_km,
+        "depth_mm": depth,
+        "km": np.array(history["km"]),
+        "max_depth_mm": np.array(history["max_depth_mm"]),
+        "peak_pressure": np.array(history["peak_pressure"]),
+    }